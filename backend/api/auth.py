@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import requests
 from backend.core.config import settings
+from backend.core.http_clients import get_async_http_client
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -10,7 +10,7 @@ class TokenRequest(BaseModel):
     password: str
 
 @router.post("/token")
-def get_jwt_token(data: TokenRequest):
+async def get_jwt_token(data: TokenRequest):
     url = f"{settings.supabase_url}/auth/v1/token?grant_type=password"
     headers = {
         "apikey": settings.supabase_anon_key,
@@ -20,7 +20,7 @@ def get_jwt_token(data: TokenRequest):
         "email": data.email,
         "password": data.password
     }
-    response = requests.post(url, json=payload, headers=headers)
+    response = await get_async_http_client().post(url, json=payload, headers=headers)
     if response.status_code != 200:
         raise HTTPException(status_code=401, detail="Invalid credentials or Supabase error")
     return response.json()
@@ -1,36 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
 from backend.models.menu_item import MenuItemCreate, MenuItemResponse, MenuItemUpdate
+from starlette.concurrency import run_in_threadpool
 from backend.dependencies import get_current_user
-from backend.db.supabase_client import get_supabase_client
+from backend.core.invalidation import menu_changed_async
+from backend.core.limiter import limit_per_user
+from backend.core.menu_cache import menu_read_cache
+from backend.core.menu_import import detect_format, import_menu_items
+from backend.db.ownership import require_menu_owner, require_item_owner, forget_item
+from backend.db.repositories import menu_item_repository
+from backend.core.embedding_codec import BINARY_FORMATS, encode_embedding, legacy_list, to_vector
+from backend.db.pagination import ndjson_response, set_next_cursor
+from backend.core.config import settings
+from typing import Literal, Optional
 from uuid import UUID
 
 router = APIRouter(prefix="/menu-items", tags=["menu_items"])
 
+EmbeddingFormat = Literal["list", "f32-base64", "f16-base64"]
+EMBEDDING_FORMAT_DESCRIPTION = (
+    "Full embedding as a float 'list', or base64 little-endian 'f32-base64' / 'f16-base64' "
+    "(implies include_embedding)"
+)
+
+def _apply_embedding_format(item: dict, embedding_format: str) -> None:
+    if "embedding" not in item:
+        return
+    if embedding_format in BINARY_FORMATS:
+        vector = to_vector(item["embedding"])
+        item["embedding"] = encode_embedding(vector, embedding_format) if vector is not None else None
+        item["embedding_format"] = embedding_format
+    else:
+        item["embedding"] = legacy_list(item["embedding"])
+
 @router.post("/", response_model=MenuItemResponse)
-def create_menu_item(
+async def create_menu_item(
     item: MenuItemCreate,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check if user owns the menu
-    menu = supabase.table("menus").select("*").eq("id", item.menu_id).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.data["restaurant_id"]).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to add item to this menu")
-    result = supabase.table("menu_items").insert(item.dict()).execute()
-    if not result.data:
+    await require_menu_owner(item.menu_id, user, "Not authorized to add item to this menu")
+    # jsonable_encoder turns the Decimal price and UUID menu_id into JSON types
+    created = await menu_item_repository.create(jsonable_encoder(item.dict()))
+    if not created:
         raise HTTPException(status_code=500, detail="Failed to create menu item")
-    return result.data[0]
+    await menu_changed_async(item.menu_id)
+    created.pop("embedding", None)
+    return created
+
+@router.post("/import", dependencies=[Depends(limit_per_user("import_menu_items"))])
+async def import_menu_items_file(
+    file: UploadFile = File(...),
+    menu_id: UUID = Form(...),
+    format: Optional[Literal["csv", "json", "ndjson"]] = Form(None),
+    user=Depends(get_current_user)
+):
+    """
+    Bulk-imports MenuItemCreate rows (CSV with a header row, a JSON array or NDJSON) into a menu.
+    Rows are validated as they are read, embedded in batches and written in chunks; a row that
+    matches an existing item (normalized name/category/price) updates it. Returns a per-row report.
+    """
+    await require_menu_owner(menu_id, user, "Not authorized to add items to this menu")
+    file_format = format or detect_format(file.filename, file.content_type)
+    # Long-running batch work (file parsing, batched embeddings, chunked writes) stays on a worker thread
+    return await run_in_threadpool(import_menu_items, str(menu_id), file.file, file_format)
 
 @router.get("/{item_id}", response_model=MenuItemResponse)
-def get_menu_item(item_id: UUID):
-    supabase = get_supabase_client()
-    result = supabase.table("menu_items").select("*").eq("id", str(item_id)).single().execute()
-    if not result.data:
+async def get_menu_item(
+    item_id: UUID,
+    include_embedding: bool = Query(False, description="Include the item's embedding vector"),
+    embedding_format: Optional[EmbeddingFormat] = Query(None, description=EMBEDDING_FORMAT_DESCRIPTION),
+):
+    include_embedding = include_embedding or embedding_format is not None
+    item = await menu_item_repository.get(item_id, include_embedding)
+    if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    item = result.data
+    if embedding_format is not None:
+        _apply_embedding_format(item, embedding_format)
+        return item
     import json
     if "embedding" in item and isinstance(item["embedding"], str):
         try:
@@ -42,45 +89,64 @@ def get_menu_item(item_id: UUID):
         item["embedding"] = ",".join(str(x) for x in item["embedding"])
     return item
 
-@router.get("/menu/{menu_id}", response_model=list[MenuItemResponse])
-def get_menu_items_for_menu(menu_id: UUID):
-    supabase = get_supabase_client()
-    result = supabase.table("menu_items").select("*").eq("menu_id", str(menu_id)).execute()
-    items = result.data if result.data else []
-    # Convert Decimal to float for price in each item
+def _serialize_listed_item(item: dict, embedding_format: Optional[str] = None):
+    # Convert Decimal to float for price
     from decimal import Decimal
     import json
-    for item in items:
-        if "price" in item and isinstance(item["price"], Decimal):
-            item["price"] = float(item["price"])
-        # Parse embedding if it's a string, then truncate for response
-        if "embedding" in item:
-            if isinstance(item["embedding"], str):
-                try:
-                    item["embedding"] = json.loads(item["embedding"])
-                except Exception:
-                    item["embedding"] = None
-            if isinstance(item["embedding"], list):
-                item["embedding"] = item["embedding"][:10]
-    return items
+    if "price" in item and isinstance(item["price"], Decimal):
+        item["price"] = float(item["price"])
+    if embedding_format is not None:
+        _apply_embedding_format(item, embedding_format)
+    # Parse embedding if it's a string, then truncate for response
+    elif "embedding" in item:
+        if isinstance(item["embedding"], str):
+            try:
+                item["embedding"] = json.loads(item["embedding"])
+            except Exception:
+                item["embedding"] = None
+        if isinstance(item["embedding"], list):
+            item["embedding"] = item["embedding"][:10]
+    return jsonable_encoder(MenuItemResponse(**item))
+
+@router.get("/menu/{menu_id}", response_model=list[MenuItemResponse])
+async def get_menu_items_for_menu(
+    menu_id: UUID,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.list_page_size_max, description="Page size; omit for the whole (cached) menu"),
+    after: Optional[UUID] = Query(None, description="Cursor: id of the last item on the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="'ndjson' streams items, one per line"),
+    include_embedding: bool = Query(False, description="Include (truncated) embedding vectors"),
+    embedding_format: Optional[EmbeddingFormat] = Query(None, description=EMBEDDING_FORMAT_DESCRIPTION),
+):
+    include_embedding = include_embedding or embedding_format is not None
+    serialize = lambda item: _serialize_listed_item(item, embedding_format)
+
+    if format == "ndjson":
+        return ndjson_response(menu_item_repository.iter_for_menu(menu_id, after, include_embedding), serialize)
+
+    if limit is not None or after is not None:
+        limit = limit or settings.list_page_size_default
+        rows, next_cursor = await menu_item_repository.list_page(menu_id, limit, after, include_embedding)
+        set_next_cursor(request, response, next_cursor, limit)
+        return [serialize(item) for item in rows]
+
+    async def load_items():
+        items = await menu_item_repository.list_for_menu(menu_id, include_embedding)
+        return [serialize(item) for item in items]
+
+    # Served from the read-through cache; If-None-Match gets a 304 without touching the DB
+    cache_kind = f"items:{embedding_format}" if embedding_format else ("items+embedding" if include_embedding else "items")
+    return (await menu_read_cache.get_or_load(cache_kind, menu_id, load_items)).response(request)
 
 @router.put("/{item_id}", response_model=MenuItemResponse)
-def update_menu_item(
+async def update_menu_item(
     item_id: UUID,
     update: MenuItemUpdate,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check ownership
-    item = supabase.table("menu_items").select("*").eq("id", str(item_id)).single().execute()
-    if not item.data:
-        raise HTTPException(status_code=404, detail="Menu item not found")
-    menu = supabase.table("menus").select("*").eq("id", item.data["menu_id"]).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.data["restaurant_id"]).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this menu item")
+    owner = await require_item_owner(item_id, user, "Not authorized to update this menu item")
     update_data = update.dict(exclude_unset=True)
     # Convert Decimal to float for JSON serialization
     for k, v in update_data.items():
@@ -90,26 +156,21 @@ def update_menu_item(
                 update_data[k] = float(v)
         except ImportError:
             pass
-    updated = supabase.table("menu_items").update(update_data).eq("id", str(item_id)).execute()
-    if not updated.data:
+    updated_item = await menu_item_repository.update(item_id, update_data)
+    if not updated_item:
         raise HTTPException(status_code=500, detail="Failed to update menu item")
-    return updated.data[0]
+    await menu_changed_async(owner["menu_id"])
+    updated_item.pop("embedding", None)
+    return updated_item
 
 @router.delete("/{item_id}", status_code=204)
-def delete_menu_item(
+async def delete_menu_item(
     item_id: UUID,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check ownership
-    item = supabase.table("menu_items").select("*").eq("id", str(item_id)).single().execute()
-    if not item.data:
-        raise HTTPException(status_code=404, detail="Menu item not found")
-    menu = supabase.table("menus").select("*").eq("id", item.data["menu_id"]).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.data["restaurant_id"]).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this menu item")
-    supabase.table("menu_items").delete().eq("id", str(item_id)).execute()
+    owner = await require_item_owner(item_id, user, "Not authorized to delete this menu item")
+    await menu_item_repository.delete(item_id)
+    forget_item(item_id)
+    await menu_changed_async(owner["menu_id"])
     return
@@ -1,85 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from backend.models.menu import MenuCreate, MenuResponse, MenuUpdate, MenuWithItems
 from backend.dependencies import get_current_user
-from backend.db.supabase_client import get_supabase_client
+from backend.core.invalidation import menu_changed_async
+from backend.core.menu_cache import menu_read_cache
+from backend.db.ownership import require_restaurant_owner, require_menu_owner, forget_menu
+from backend.db.repositories import menu_item_repository, menu_repository
+from backend.db.pagination import ndjson_response, set_next_cursor
+from backend.core.config import settings
+from typing import Literal, Optional
 from uuid import UUID
 
 router = APIRouter(prefix="/menus", tags=["menus"])
 
 @router.post("/", response_model=MenuResponse)
-def create_menu(
+async def create_menu(
     menu: MenuCreate,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check if user owns the restaurant
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.restaurant_id).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to add menu to this restaurant")
-    result = supabase.table("menus").insert({
-        "restaurant_id": str(menu.restaurant_id),
-        "title": menu.title
-    }).execute()
-    if not result.data:
+    await require_restaurant_owner(menu.restaurant_id, user, "Not authorized to add menu to this restaurant")
+    created = await menu_repository.create(menu.restaurant_id, menu.title)
+    if not created:
         raise HTTPException(status_code=500, detail="Failed to create menu")
-    return result.data[0]
+    return created
 
 @router.get("/{menu_id}", response_model=MenuWithItems)
-def get_menu(menu_id: UUID):
-    supabase = get_supabase_client()
-    menu = supabase.table("menus").select("*").eq("id", str(menu_id)).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    items = supabase.table("menu_items").select("*").eq("menu_id", str(menu_id)).execute()
-    menu_data = menu.data
-    menu_data["items"] = items.data if items.data else []
-    return menu_data
+async def get_menu(
+    menu_id: UUID,
+    request: Request,
+    include_embedding: bool = Query(False, description="Include item embedding vectors"),
+):
+    async def load_menu():
+        # The menu row and its items are fetched concurrently
+        menu_data, items = await asyncio.gather(
+            menu_repository.get(menu_id),
+            menu_item_repository.list_for_menu(menu_id, include_embedding),
+        )
+        if not menu_data:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        menu_data["items"] = items
+        return jsonable_encoder(MenuWithItems(**menu_data))
+
+    # Served from the read-through cache; If-None-Match gets a 304 without touching the DB
+    cache_kind = "menu+embedding" if include_embedding else "menu"
+    return (await menu_read_cache.get_or_load(cache_kind, menu_id, load_menu)).response(request)
 
 @router.get("/", response_model=list[MenuResponse])
-def list_all_menus():
-    supabase = get_supabase_client()
-    result = supabase.table("menus").select("*").execute()
-    return result.data if result.data else []
+async def list_all_menus(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.list_page_size_default, ge=1, le=settings.list_page_size_max, description="Page size"),
+    after: Optional[UUID] = Query(None, description="Cursor: id of the last menu on the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="'ndjson' streams every menu, one per line"),
+):
+    if format == "ndjson":
+        return ndjson_response(menu_repository.iter_all(after), lambda row: jsonable_encoder(MenuResponse(**row)))
+    rows, next_cursor = await menu_repository.list_page(limit, after)
+    # Next page is advertised in X-Next-Cursor / Link headers so the body stays a plain list
+    set_next_cursor(request, response, next_cursor, limit)
+    return rows
 
 @router.get("/restaurant/{restaurant_id}", response_model=list[MenuResponse])
-def get_menus_for_restaurant(restaurant_id: UUID):
-    supabase = get_supabase_client()
-    result = supabase.table("menus").select("*").eq("restaurant_id", str(restaurant_id)).execute()
-    return result.data if result.data else []
+async def get_menus_for_restaurant(restaurant_id: UUID):
+    return await menu_repository.list_for_restaurant(restaurant_id)
 
 @router.put("/{menu_id}", response_model=MenuResponse)
-def update_menu(
+async def update_menu(
     menu_id: UUID,
     update: MenuUpdate,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check ownership
-    menu = supabase.table("menus").select("*").eq("id", str(menu_id)).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.data["restaurant_id"]).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this menu")
-    updated = supabase.table("menus").update({
-        "title": update.title
-    }).eq("id", str(menu_id)).execute()
-    if not updated.data:
+    await require_menu_owner(menu_id, user, "Not authorized to update this menu")
+    updated = await menu_repository.update(menu_id, {"title": update.title})
+    if not updated:
         raise HTTPException(status_code=500, detail="Failed to update menu")
-    return updated.data[0]
+    await menu_changed_async(menu_id)
+    return updated
 
 @router.delete("/{menu_id}", status_code=204)
-def delete_menu(
+async def delete_menu(
     menu_id: UUID,
     user=Depends(get_current_user)
 ):
-    supabase = get_supabase_client()
     # Check ownership
-    menu = supabase.table("menus").select("*").eq("id", str(menu_id)).single().execute()
-    if not menu.data:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    restaurant = supabase.table("restaurants").select("*").eq("id", menu.data["restaurant_id"]).single().execute()
-    if not restaurant.data or restaurant.data["owner_id"] != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this menu")
-    supabase.table("menus").delete().eq("id", str(menu_id)).execute()
+    await require_menu_owner(menu_id, user, "Not authorized to delete this menu")
+    await menu_repository.delete(menu_id)
+    forget_menu(menu_id)
+    await menu_changed_async(menu_id)
     return
@@ -1,21 +1,164 @@
+import asyncio
 import json
-from fastapi import APIRouter, Query, HTTPException, Request
-from backend.core.limiter import limiter
+import re
+import time
+from fastapi import APIRouter, Depends, Query, HTTPException
+from starlette.concurrency import run_in_threadpool
+from backend.core.limiter import limit_per_restaurant
 from typing import Optional, List
-import os
-from openai import AzureOpenAI
-from backend.db.supabase_client import get_supabase_client
+from backend.db.supabase_client import get_async_supabase_client
+from backend.core.ai_clients import get_chat_client, get_embedding_client
 from backend.core.config import settings
+from backend.core.embedding_cache import query_embedding_cache, normalize_query
+from backend.core.filter_extractor import extract_filters
+from backend.core.cache import TTLCache
+from backend.core.invalidation import menu_generations, on_menu_changed
+from backend.core.local_search import local_search_engine
 from backend.core.logging_config import get_logger
+from backend.core.metrics import timed
+from backend.db.projections import MENU_ITEM_COLUMNS
+from backend.db.repositories import menu_item_repository
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/search", tags=["search"])
 
-@router.get("/")
-@limiter.limit("50/minute")
+# Distinct categories per menu with the shared generation they were read at, used by the
+# local filter extractor
+_menu_categories = TTLCache(max_size=1024, ttl_seconds=300)
+on_menu_changed(_menu_categories.pop)
+
+_SEARCH_TERM = re.compile(r"[a-z0-9]{3,}")
+
+SEARCH_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_menu_items",
+            "description": "Search for menu items with optional filters.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The natural language query for menu items, excluding filter terms (e.g., 'spicy chicken', 'pasta dish')."
+                    },
+                    "category": {
+                        "type": "string",
+                        "description": "The category of the menu item (e.g., 'Appetizers', 'Main Course', 'Desserts')."
+                    },
+                    "is_veg": {
+                        "type": "boolean",
+                        "description": "True if the item should be vegetarian, false otherwise."
+                    },
+                    "price_max": {
+                        "type": "number",
+                        "description": "The maximum price for the menu item."
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
+async def get_menu_categories(menu_id: str) -> list[str]:
+    generation = menu_generations.get(menu_id)
+    cached = _menu_categories.get(menu_id)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    try:
+        categories = await menu_item_repository.categories(menu_id)
+    except Exception as e:
+        logger.error(f"Failed to load categories for menu_id={menu_id}: {str(e)}")
+        return []
+    if generation == menu_generations.get(menu_id):
+        _menu_categories.set(menu_id, (generation, categories))
+    return categories
+
+async def extract_filters_with_llm(query: str) -> Optional[dict]:
+    """
+    Uses GPT-4o function calling to extract filters from the query.
+    Returns the `search_menu_items` arguments, or None if the model made no tool call.
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant for searching menu items. Extract relevant search terms and filters."},
+        {"role": "user", "content": query}
+    ]
+    logger.info("Calling LLM for function extraction with query: %s", query)
+    with timed("azure_chat"):
+        chat_response = await get_chat_client().chat.completions.create(
+            model="gpt-4o", # Or your specific chat completion deployment name
+            messages=messages,
+            tools=SEARCH_TOOLS,
+            tool_choice="auto"
+        )
+    tool_calls = chat_response.choices[0].message.tool_calls or []
+    for tool_call in tool_calls:
+        if tool_call.function.name == "search_menu_items":
+            return json.loads(tool_call.function.arguments)
+    return None
+
+async def embed_query(text: str) -> list:
+    """Embeds a search query, served from the query embedding cache when possible."""
+    embedding = query_embedding_cache.get(text)
+    if embedding is None and query_embedding_cache.persistent:
+        # SQLite is only read on a memory miss, and off the event loop
+        embedding = await run_in_threadpool(query_embedding_cache.load, text)
+    if embedding is not None:
+        logger.info("Query embedding cache hit for: %s", text)
+        return embedding
+    with timed("azure_embedding"):
+        embedding_response = await get_embedding_client().embeddings.create(
+            input=[text],
+            model=settings.azure_openai_embedding_deployment
+        )
+    embedding = embedding_response.data[0].embedding
+    logger.info("Search query embedding input: %s", text)
+    logger.debug("Query embedding (first 5): %s", embedding[:5])
+    query_embedding_cache.put(text, embedding)
+    return embedding
+
+def queries_match(a: str, b: str) -> bool:
+    """True when two queries are the same or nearly the same (token Jaccard similarity)."""
+    tokens_a = set(normalize_query(a).split())
+    tokens_b = set(normalize_query(b).split())
+    if tokens_a == tokens_b:
+        return True
+    if not tokens_a or not tokens_b:
+        return False
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b) >= settings.search_speculative_similarity
+
+async def text_only_search(
+    menu_id: str,
+    text: str,
+    category: Optional[str],
+    is_veg: Optional[bool],
+    price_max: Optional[float],
+    limit: int,
+) -> list:
+    """Degraded search path: keyword match on name/description with the same filters, no embedding."""
+    supabase = await get_async_supabase_client()
+    request = supabase.table("menu_items").select(MENU_ITEM_COLUMNS).eq("menu_id", menu_id)
+    if category:
+        request = request.ilike("category", category)
+    if is_veg is not None:
+        request = request.eq("is_veg", is_veg)
+    if price_max is not None:
+        request = request.lte("price", price_max)
+    terms = _SEARCH_TERM.findall(text.lower())[:5]
+    if terms:
+        request = request.or_(",".join(
+            f"name.ilike.*{term}*,description.ilike.*{term}*" for term in terms
+        ))
+    response = await request.limit(limit).execute()
+    return response.data or []
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+@router.get("/", dependencies=[Depends(limit_per_restaurant("search"))])
 async def hybrid_search(
-    request: Request,
     menu_id: str = Query(..., description="Menu UUID"),
     query: str = Query(..., description="Natural language search query (e.g., 'spicy chicken under $15')"),
     # These parameters can now be inferred by the LLM, but are kept for explicit filtering if needed
@@ -27,132 +170,154 @@ async def hybrid_search(
     """
     Hybrid RAG search endpoint with AI-powered filter extraction:
     Combines LLM function calling for filter extraction, vector similarity, and full-text search.
+    Simple queries are handled by a local rule-based extractor and skip the LLM call;
+    `filter_source` in the response reports which path was taken ("local", "llm", "fallback" or "skipped").
+
+    Stages run under per-stage deadlines. The query is embedded speculatively while filters
+    are extracted; a stage that misses its deadline degrades (LLM filters are skipped, or the
+    search falls back to full-text only) and is listed in `degraded`.
     """
     extracted_category = category
     extracted_is_veg = is_veg
     extracted_price_max = price_max
     query_for_search = query  # Ensure this is always defined
-    
-    # 1. Use LLM for Function Calling to extract filters from the query
-    try:
-        llm_client = AzureOpenAI(
-            api_key=settings.azure_openai_api_key,
-            azure_endpoint=settings.azure_openai_endpoint,
-            api_version=settings.azure_openai_embedding_api_version # Assuming this version works for chat completions too
-        )
+    filter_source = "llm"
+    degraded = []
 
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_menu_items",
-                    "description": "Search for menu items with optional filters.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The natural language query for menu items, excluding filter terms (e.g., 'spicy chicken', 'pasta dish')."
-                            },
-                            "category": {
-                                "type": "string",
-                                "description": "The category of the menu item (e.g., 'Appetizers', 'Main Course', 'Desserts')."
-                            },
-                            "is_veg": {
-                                "type": "boolean",
-                                "description": "True if the item should be vegetarian, false otherwise."
-                            },
-                            "price_max": {
-                                "type": "number",
-                                "description": "The maximum price for the menu item."
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-            }
-        ]
+    # 0. Speculatively embed the query (minus price/veg phrases) while filters are being extracted
+    speculative_text = extract_filters(query).query
+    speculative_embedding = asyncio.create_task(embed_query(speculative_text))
+    # Retrieve the outcome even if the speculative result ends up unused
+    speculative_embedding.add_done_callback(lambda task: task.cancelled() or task.exception())
 
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant for searching menu items. Extract relevant search terms and filters."},
-            {"role": "user", "content": query}
-        ]
+    # 1. Filter extraction stage
+    filter_deadline = time.monotonic() + settings.search_filter_deadline_ms / 1000
+    local = None
+    if settings.local_filter_extraction_enabled:
+        try:
+            categories = await asyncio.wait_for(get_menu_categories(menu_id), timeout=_remaining(filter_deadline))
+        except asyncio.TimeoutError:
+            logger.warning(f"Category lookup missed its deadline for menu_id={menu_id}")
+            categories = []
+        local = extract_filters(query, categories)
+        logger.info("Local filter extraction: %s", local)
+        if local.confidence >= settings.local_filter_min_confidence:
+            filter_source = "local"
 
-        logger.info(f"Calling LLM for function extraction with query: {query}")
-        chat_response = llm_client.chat.completions.create(
-            model="gpt-4o", # Or your specific chat completion deployment name
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
-        
-        tool_calls = chat_response.choices[0].message.tool_calls
-        if tool_calls:
-            for tool_call in tool_calls:
-                if tool_call.function.name == "search_menu_items":
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Override explicit query params with LLM-extracted ones if present
-                    if "category" in function_args:
-                        extracted_category = function_args["category"]
-                    if "is_veg" in function_args:
-                        extracted_is_veg = function_args["is_veg"]
-                    if "price_max" in function_args:
-                        extracted_price_max = function_args["price_max"]
-                    
-                    # Use the LLM-parsed query for the actual search
-                    query_for_search = function_args.get("query", query)
-                    logger.info(f"LLM extracted filters: category={extracted_category}, is_veg={extracted_is_veg}, price_max={extracted_price_max}, query_for_search='{query_for_search}'")
-        else:
-            query_for_search = query # No tool call, use original query
-            logger.info("LLM did not suggest a tool call. Using original query for search.")
+    if filter_source == "llm":
+        try:
+            function_args = await asyncio.wait_for(extract_filters_with_llm(query), timeout=_remaining(filter_deadline))
+            if function_args:
+                # Override explicit query params with LLM-extracted ones if present
+                if "category" in function_args:
+                    extracted_category = function_args["category"]
+                if "is_veg" in function_args:
+                    extracted_is_veg = function_args["is_veg"]
+                if "price_max" in function_args:
+                    extracted_price_max = function_args["price_max"]
+                # Use the LLM-parsed query for the actual search
+                query_for_search = function_args.get("query", query)
+                logger.info(
+                    "LLM extracted filters: category=%s, is_veg=%s, price_max=%s, query_for_search='%s'",
+                    extracted_category, extracted_is_veg, extracted_price_max, query_for_search,
+                )
+            else:
+                logger.info("LLM did not suggest a tool call. Using original query for search.")
+        except asyncio.TimeoutError:
+            # Degrade: use whatever the local parser found instead of waiting on the LLM
+            logger.warning("LLM filter extraction missed its deadline; skipping LLM filters.")
+            degraded.append("llm_filters_skipped")
+            filter_source = "skipped" if local is not None else "fallback"
+        except Exception as e:
+            logger.error(f"LLM function calling error: {str(e)}")
+            # Fallback: proceed with original query and explicit filters if LLM fails
+            logger.warning("Falling back to original query and explicit filters due to LLM error.")
+            filter_source = "fallback"
 
-    except Exception as e:
-        logger.error(f"LLM function calling error: {str(e)}")
-        # Fallback: proceed with original query and explicit filters if LLM fails
-        query_for_search = query
-        logger.warning("Falling back to original query and explicit filters due to LLM error.")
+    if filter_source in ("local", "skipped") and local is not None:
+        if local.category is not None:
+            extracted_category = local.category
+        if local.is_veg is not None:
+            extracted_is_veg = local.is_veg
+        if local.price_max is not None:
+            extracted_price_max = local.price_max
+        query_for_search = local.query
 
-    # 2. Generate embedding for the (potentially refined) query using Azure OpenAI
+    # 2. Embedding stage: reuse the speculative embedding when the refined query is (nearly) the same
+    embedding = None
+    embedding_deadline = time.monotonic() + settings.search_embedding_deadline_ms / 1000
+    if queries_match(query_for_search, speculative_text):
+        embedding_task = speculative_embedding
+    else:
+        speculative_embedding.cancel()
+        embedding_task = asyncio.create_task(embed_query(query_for_search))
     try:
-        embedding_client = AzureOpenAI(
-            api_key=settings.azure_openai_embedding_api_key,
-            azure_endpoint=settings.azure_openai_embedding_endpoint,
-            api_version=settings.azure_openai_embedding_api_version
-        )
-        embedding_response = embedding_client.embeddings.create(
-            input=[query_for_search],
-            model=settings.azure_openai_embedding_deployment
-        )
-        embedding = embedding_response.data[0].embedding
-        logger.info(f"Search query embedding input: {query_for_search}")
-        logger.info(f"Query embedding (first 5): {embedding[:5]}")
+        embedding = await asyncio.wait_for(embedding_task, timeout=_remaining(embedding_deadline))
+    except asyncio.TimeoutError:
+        logger.warning("Query embedding missed its deadline; falling back to full-text search.")
+        degraded.append("text_only")
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Embedding service error: {str(e)}")
-
-    # 3. Prepare parameters for the dedicated Supabase RPC
-    params = {
-        "query_embedding": embedding,
-        # "search_query": query_for_search, # Use the LLM-refined query for FTS
-        "menu_uuid": menu_id,
-        "p_category": extracted_category,
-        "p_is_veg": extracted_is_veg,
-        "p_price_max": extracted_price_max,
-        "p_limit": limit,
-    }
-    logger.info(f"Calling RPC 'hybrid_search_items' with params: {params}")
+        logger.error(f"Embedding service error: {str(e)}")
+        degraded.append("text_only")
 
-    # 4. Query Supabase/Postgres by calling the dedicated function
+    # 3. Retrieval stage
+    rpc_deadline = settings.search_rpc_deadline_ms / 1000
     try:
-        supabase = get_supabase_client()
-        response = supabase.rpc("hybrid_search_items", params).execute()
-        results = response.data if response.data else []
-        
+        if settings.local_search_enabled:
+            # In-process vector + BM25 engine; also covers the text-only case when embedding is None
+            results = await asyncio.wait_for(
+                local_search_engine.search(
+                    menu_id,
+                    embedding,
+                    query_for_search,
+                    category=extracted_category,
+                    is_veg=extracted_is_veg,
+                    price_max=extracted_price_max,
+                    limit=limit,
+                ),
+                timeout=rpc_deadline,
+            )
+        elif embedding is not None:
+            # Prepare parameters for the dedicated Supabase RPC
+            params = {
+                "query_embedding": embedding,
+                # "search_query": query_for_search, # Use the LLM-refined query for FTS
+                "menu_uuid": menu_id,
+                "p_category": extracted_category,
+                "p_is_veg": extracted_is_veg,
+                "p_price_max": extracted_price_max,
+                "p_limit": limit,
+            }
+            # The 1536-float query embedding is left out of the log line
+            logger.info(
+                "Calling RPC 'hybrid_search_items' with params: %s",
+                {key: value for key, value in params.items() if key != "query_embedding"},
+                extra={"fields": {"embedding_dims": len(embedding)}},
+            )
+            supabase = await get_async_supabase_client()
+            response = await asyncio.wait_for(
+                supabase.rpc("hybrid_search_items", params).execute(), timeout=rpc_deadline
+            )
+            results = response.data if response.data else []
+        else:
+            results = await asyncio.wait_for(
+                text_only_search(menu_id, query_for_search, extracted_category, extracted_is_veg, extracted_price_max, limit),
+                timeout=rpc_deadline,
+            )
+    except asyncio.TimeoutError:
+        logger.error("Search retrieval missed its deadline.")
+        raise HTTPException(status_code=504, detail="Search timed out")
     except Exception as e:
         logger.error(f"Database RPC error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database query error: {str(e)}")
 
     if not results:
-        return {"results": [], "message": "No results found."}
+        return {"results": [], "message": "No results found.", "filter_source": filter_source, "degraded": degraded}
+
+    return {"results": results, "filter_source": filter_source, "degraded": degraded}
+
 
-    return {"results": results}
+@router.get("/cache-stats")
+async def embedding_cache_stats():
+    """Hit/miss counters for the query embedding cache."""
+    return query_embedding_cache.stats()
@@ -0,0 +1,148 @@
+"""
+Backfills and re-embeds menu_items.embedding.
+
+Finds items with no embedding, or whose embedding_version differs from the current
+tag (EMBEDDING_VERSION, default: the embedding deployment name), in keyset batches and
+re-embeds them with batched, Retry-After-aware requests. Progress is checkpointed after
+every batch, so a killed run picks up where it stopped.
+
+    python -m backend.backfill_embeddings                    # everything missing or stale
+    python -m backend.backfill_embeddings --menu-id <uuid>   # one menu
+    python -m backend.backfill_embeddings --dry-run          # count only
+    python -m backend.backfill_embeddings --restart          # ignore the checkpoint
+
+Requires the menu_items.embedding_version column (see memory-bank/databaseSchema.md).
+Each re-embedded menu's shared generation is bumped, so API workers reload their cached
+payloads and local search indexes for it on the next request.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from backend.core.config import settings
+from backend.core.embeddings import embedding_version
+from backend.core.invalidation import menu_changed
+from backend.core.logging_config import get_logger
+from backend.core.menu_pipeline import attach_embeddings
+from backend.db.pagination import fetch_page
+from backend.db.supabase_client import get_supabase_client
+
+logger = get_logger(__name__)
+
+
+def load_checkpoint(path: str, scope: dict) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("scope") != scope:
+        logger.warning(f"Ignoring checkpoint {path}: it belongs to a different run ({checkpoint.get('scope')})")
+        return None
+    if checkpoint.get("done"):
+        # A finished run is not resumed; new or failed items are picked up by scanning again
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # Write-then-rename so a kill mid-write never leaves a truncated checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({**checkpoint, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def stale_items_query(version: str, menu_id: Optional[str], reembed_all: bool):
+    def build():
+        query = get_supabase_client().table("menu_items").select("id, menu_id, name, description, embedding_version")
+        if menu_id:
+            query = query.eq("menu_id", menu_id)
+        if not reembed_all:
+            # Filtering on `embedding is null` does not transfer the vector
+            query = query.or_(f"embedding.is.null,embedding_version.is.null,embedding_version.neq.\"{version}\"")
+        return query
+    return build
+
+
+def write_embeddings(items: list, version: str) -> int:
+    """One UPDATE per item (rows differ in value), run concurrently. Returns the number written."""
+    def update(item):
+        # Always tagged here, whatever EMBEDDING_VERSION_TAGGING says: rows carry their old version from the scan
+        get_supabase_client().table("menu_items").update({
+            "embedding": item["embedding"],
+            "embedding_version": version,
+        }).eq("id", item["id"]).execute()
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.embedding_max_concurrency)) as pool:
+        list(pool.map(update, items))
+    return len(items)
+
+
+def run(args: argparse.Namespace) -> dict:
+    version = embedding_version()
+    scope = {"version": version, "menu_id": args.menu_id, "all": args.all}
+    checkpoint = None if args.restart else load_checkpoint(args.checkpoint, scope)
+    state = checkpoint or {"scope": scope, "after": None, "scanned": 0, "embedded": 0, "failed": 0}
+    if checkpoint:
+        logger.info(f"Resuming embedding backfill after id={state['after']} ({state['embedded']} embedded so far)")
+
+    build_query = stale_items_query(version, args.menu_id, args.all)
+    # Minimum seconds per batch so embedding requests stay under --max-requests-per-minute
+    requests_per_batch = math.ceil(args.batch_size / max(1, settings.embedding_batch_size))
+    min_batch_seconds = 60.0 * requests_per_batch / args.max_requests_per_minute if args.max_requests_per_minute else 0.0
+
+    next_cursor = None
+    while True:
+        started = time.monotonic()
+        rows, next_cursor = fetch_page(build_query, args.batch_size, state["after"])
+        if not rows:
+            break
+        state["scanned"] += len(rows)
+        if not args.dry_run:
+            attach_embeddings(rows)
+            embedded = [row for row in rows if row.get("embedding") is not None]
+            state["embedded"] += write_embeddings(embedded, version)
+            # Bumps the shared menu generations so running API workers drop their cached payloads
+            for menu_id in {row["menu_id"] for row in embedded}:
+                menu_changed(menu_id)
+            # Failed items keep their old/missing embedding and are picked up again by the next full scan
+            state["failed"] += len(rows) - len(embedded)
+        state["after"] = rows[-1]["id"]
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, state)
+        logger.info(
+            f"Embedding backfill: scanned={state['scanned']} embedded={state['embedded']} "
+            f"failed={state['failed']} after={state['after']}"
+        )
+        if next_cursor is None or (args.max_items and state["scanned"] >= args.max_items):
+            break
+        elapsed = time.monotonic() - started
+        if elapsed < min_batch_seconds:
+            time.sleep(min_batch_seconds - elapsed)
+
+    state["done"] = next_cursor is None
+    if not args.dry_run:
+        save_checkpoint(args.checkpoint, state)
+    return state
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill missing or stale menu item embeddings.")
+    parser.add_argument("--menu-id", help="Only this menu's items")
+    parser.add_argument("--all", action="store_true", help="Re-embed every item, not just missing/stale ones")
+    parser.add_argument("--batch-size", type=int, default=200, help="Items per keyset batch")
+    parser.add_argument("--max-items", type=int, default=0, help="Stop after scanning this many items (0 = no limit)")
+    parser.add_argument("--max-requests-per-minute", type=int, default=0, help="Pace embedding requests (0 = unpaced)")
+    parser.add_argument("--checkpoint", default="embedding_backfill.checkpoint.json", help="Checkpoint file path")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the items that would be embedded")
+    state = run(parser.parse_args(argv))
+    print(json.dumps(state, indent=2))
+
+
+if __name__ == "__main__":
+    main()
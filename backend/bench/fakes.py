@@ -0,0 +1,620 @@
+"""
+Local stand-ins for Supabase and Azure OpenAI, used by the load benchmark.
+
+    python -m backend.bench.fakes --supabase-port 54331 --azure-port 54332 \\
+        --latency azure_vision=4000:1000 --errors azure_embedding=0.02:429
+
+Supabase: an in-memory PostgREST subset (select with many-to-one embeds, eq/neq/gt/gte/lt/
+lte/is/ilike/in/or filters, order/limit, single-object responses, insert/upsert/update/delete
+with return=representation), the hybrid_search_items RPC (cosine ranking over the stored
+embeddings) and the Auth endpoints the API calls (/auth/v1/user, /auth/v1/token, JWKS).
+
+Azure: chat completions (a search_menu_items tool call when tools are offered, a
+{"menu_items": [...]} payload for image inputs, streamed as SSE when stream=true) and
+embeddings (deterministic unit vectors per input text, float lists or base64).
+
+Every response is delayed by the latency profile of its service and fails with the given
+probability. Service names match the API's Server-Timing stages: supabase_table,
+supabase_rpc, supabase_auth, azure_chat, azure_embedding, azure_vision; a prefix
+("supabase", "azure") applies to every matching service.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import jwt
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 1536
+# HS256 secret shared by the fakes, the app under test and the load runner (32+ bytes for PyJWT)
+DEFAULT_JWT_SECRET = "menumind-benchmark-jwt-secret-not-for-production"
+
+DEFAULT_LATENCY_MS = {
+    "supabase_table": (8, 4),
+    "supabase_rpc": (25, 10),
+    "supabase_auth": (20, 5),
+    "azure_chat": (600, 200),
+    "azure_embedding": (80, 30),
+    "azure_vision": (4000, 1000),
+}
+
+# Many-to-one relations that selects may embed: related table -> foreign key column
+FOREIGN_KEYS = {"restaurants": "restaurant_id", "menus": "menu_id"}
+# Child rows removed with their parent (ON DELETE CASCADE)
+CASCADES = {"restaurants": [("menus", "restaurant_id")], "menus": [("menu_items", "menu_id")]}
+VECTOR_COLUMNS = {"embedding"}
+
+_DISHES = [
+    "Paneer Tikka", "Chicken Curry", "Veg Biryani", "Lamb Rogan Josh", "Dal Makhani", "Fish Tacos",
+    "Margherita Pizza", "Pepperoni Pizza", "Caesar Salad", "Greek Salad", "Tomato Soup", "Ramen",
+    "Pad Thai", "Green Curry", "Falafel Wrap", "Beef Burger", "Veggie Burger", "Mushroom Risotto",
+    "Spaghetti Carbonara", "Penne Arrabbiata", "Chocolate Cake", "Mango Lassi", "Tiramisu", "Spring Rolls",
+]
+_STYLES = ["", "Spicy ", "Classic ", "Smoked ", "Crispy ", "House ", "Garlic ", "Chef's "]
+_CATEGORIES = ["Appetizers", "Main Course", "Pasta", "Salads", "Soups", "Desserts", "Drinks"]
+_MEAT = ("chicken", "lamb", "fish", "beef", "pepperoni", "carbonara")
+
+
+def sample_menu_items(seed: int, count: int) -> list[dict]:
+    """Deterministic, plausible MenuItemCreate-shaped rows (no menu_id)."""
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        name = f"{rng.choice(_STYLES)}{rng.choice(_DISHES)}"
+        if index >= len(_DISHES):
+            name = f"{name} {index}"
+        items.append({
+            "name": name,
+            "description": f"{name} prepared fresh to order.",
+            "description_source": "inferred",
+            "price": f"{rng.randint(4, 30)}.{rng.choice(['00', '50', '95'])}",
+            "category": rng.choice(_CATEGORIES),
+            "is_veg": not any(word in name.lower() for word in _MEAT),
+            "spice_level": rng.choice(["mild", "medium", "hot"]),
+        })
+    return items
+
+
+def fake_embedding(text: str) -> np.ndarray:
+    """Unit vector seeded by the text, so the same input always embeds the same way."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@dataclass
+class ServiceProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+class Faults:
+    """Latency and error injection per service (see the module docstring for service names)."""
+
+    def __init__(self, latency: dict[str, tuple[float, float]], errors: dict[str, tuple[float, int]], seed: int = 0):
+        self.latency = latency
+        self.errors = errors
+        self.random = random.Random(seed)
+
+    def _lookup(self, table: dict, service: str):
+        if service in table:
+            return table[service]
+        for prefix, value in table.items():
+            if service.startswith(prefix):
+                return value
+        return None
+
+    def profile(self, service: str) -> ServiceProfile:
+        latency = self._lookup(self.latency, service) or (0.0, 0.0)
+        errors = self._lookup(self.errors, service) or (0.0, 503)
+        return ServiceProfile(latency[0], latency[1], errors[0], errors[1])
+
+    def delay_seconds(self, service: str) -> float:
+        profile = self.profile(service)
+        return max(0.0, profile.latency_ms + self.random.uniform(-profile.jitter_ms, profile.jitter_ms)) / 1000
+
+    async def apply(self, service: str) -> Optional[int]:
+        """Sleeps for the service latency; returns an error status to respond with, or None."""
+        profile = self.profile(service)
+        await asyncio.sleep(self.delay_seconds(service))
+        if profile.error_rate and self.random.random() < profile.error_rate:
+            return profile.error_status
+        return None
+
+
+# ---------------------------------------------------------------------------
+# PostgREST subset
+# ---------------------------------------------------------------------------
+
+class PostgrestError(Exception):
+    def __init__(self, status_code: int, code: str, message: str):
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+def _split_top_level(text: str, separator: str = ",") -> list[str]:
+    """Splits on separators outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _compare_value(stored, text: str):
+    """Converts a filter literal to the stored value's type so comparisons behave like SQL."""
+    if isinstance(stored, bool):
+        return text.lower() == "true"
+    if isinstance(stored, (int, float)):
+        try:
+            return float(text)
+        except ValueError:
+            return text
+    return text
+
+
+def _matches(row: dict, column: str, operator: str, value: str) -> bool:
+    negate = operator.startswith("not.")
+    if negate:
+        operator = operator[len("not."):]
+    stored = row.get(column)
+    value = _unquote(value)
+    if operator == "is":
+        result = stored is None if value == "null" else stored is (value == "true")
+    elif stored is None:
+        result = False
+    elif operator in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        target = _compare_value(stored, value)
+        left = str(stored) if isinstance(target, str) and not isinstance(stored, bool) else stored
+        result = {
+            "eq": lambda: left == target,
+            "neq": lambda: left != target,
+            "gt": lambda: left > target,
+            "gte": lambda: left >= target,
+            "lt": lambda: left < target,
+            "lte": lambda: left <= target,
+        }[operator]()
+    elif operator in ("ilike", "like"):
+        pattern = "^" + re.escape(value).replace(r"\*", ".*").replace("%", ".*") + "$"
+        result = re.match(pattern, str(stored), re.IGNORECASE if operator == "ilike" else 0) is not None
+    elif operator == "in":
+        options = {_unquote(option) for option in _split_top_level(value.strip("()"))}
+        candidate = str(stored).lower() if isinstance(stored, bool) else str(stored)
+        result = candidate in options
+    else:
+        raise PostgrestError(400, "PGRST100", f"Unsupported operator: {operator}")
+    return not result if negate else result
+
+
+def _condition(expression: str):
+    """`column.operator.value` (as used inside or=(...)) -> row predicate."""
+    column, rest = expression.split(".", 1)
+    if rest.startswith("not."):
+        operator, value = rest[len("not."):].split(".", 1)
+        operator = f"not.{operator}"
+    else:
+        operator, value = rest.split(".", 1)
+    return lambda row: _matches(row, column, operator, value)
+
+
+class PostgrestStore:
+    def __init__(self):
+        self.tables: dict[str, dict[str, dict]] = {"restaurants": {}, "menus": {}, "menu_items": {}}
+
+    # -- reads --------------------------------------------------------------
+
+    def _filters(self, params) -> list:
+        predicates = []
+        for key, value in params.multi_items():
+            if key in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+                continue
+            if key == "or":
+                conditions = [_condition(part) for part in _split_top_level(value.strip()[1:-1])]
+                predicates.append(lambda row, conditions=conditions: any(c(row) for c in conditions))
+            else:
+                operator, literal = value.split(".", 1)
+                if operator == "not":
+                    inner, literal = literal.split(".", 1)
+                    operator = f"not.{inner}"
+                predicates.append(lambda row, k=key, o=operator, v=literal: _matches(row, k, o, v))
+        return predicates
+
+    def _project(self, row: dict, select: str) -> dict:
+        projected = {}
+        for field in _split_top_level(select or "*"):
+            if field == "*":
+                projected.update({k: self._output_value(k, v) for k, v in row.items()})
+            elif "(" in field:
+                relation, inner = field.split("(", 1)
+                relation = relation.split(":")[-1].split("!")[0]
+                parent_id = row.get(FOREIGN_KEYS.get(relation, ""))
+                parent = self.tables.get(relation, {}).get(parent_id)
+                projected[relation] = self._project(parent, inner[:-1]) if parent else None
+            else:
+                projected[field] = self._output_value(field, row.get(field))
+        return projected
+
+    @staticmethod
+    def _output_value(column: str, value):
+        # pgvector columns come back from PostgREST as "[x,y,...]" text
+        if column in VECTOR_COLUMNS and isinstance(value, list):
+            return json.dumps(value, separators=(",", ":"))
+        return value
+
+    def query(self, table: str, params) -> list[dict]:
+        rows = [row for row in self._table(table).values() if all(p(row) for p in self._filters(params))]
+        for ordering in reversed(_split_top_level(params.get("order", ""))):
+            column, *modifiers = ordering.split(".")
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse="desc" in modifiers)
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        return rows
+
+    def _table(self, table: str) -> dict:
+        if table not in self.tables:
+            raise PostgrestError(404, "42P01", f'relation "public.{table}" does not exist')
+        return self.tables[table]
+
+    # -- writes -------------------------------------------------------------
+
+    @staticmethod
+    def _normalize(row: dict) -> dict:
+        if "price" in row and row["price"] is not None:
+            row["price"] = float(row["price"])
+        if isinstance(row.get("embedding"), str):
+            row["embedding"] = json.loads(row["embedding"])
+        return row
+
+    def insert(self, table: str, rows: list[dict], upsert: bool) -> list[dict]:
+        target = self._table(table)
+        written = []
+        for row in rows:
+            row = self._normalize(dict(row))
+            row_id = str(row.get("id") or uuid.uuid4())
+            if row_id in target and not upsert:
+                raise PostgrestError(409, "23505", f'duplicate key value violates unique constraint "{table}_pkey"')
+            existing = target.get(row_id, {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())})
+            target[row_id] = {**existing, **row, "id": row_id}
+            written.append(target[row_id])
+        return written
+
+    def update(self, table: str, params, values: dict) -> list[dict]:
+        rows = self.query(table, params)
+        values = self._normalize(dict(values))
+        for row in rows:
+            row.update(values)
+        return rows
+
+    def delete(self, table: str, params) -> list[dict]:
+        rows = self.query(table, params)
+        for row in rows:
+            self._delete_row(table, row["id"])
+        return rows
+
+    def _delete_row(self, table: str, row_id: str) -> None:
+        self.tables[table].pop(row_id, None)
+        for child_table, column in CASCADES.get(table, []):
+            for child_id in [cid for cid, child in self.tables[child_table].items() if child.get(column) == row_id]:
+                self._delete_row(child_table, child_id)
+
+    # -- RPC ----------------------------------------------------------------
+
+    def hybrid_search_items(self, params: dict) -> list[dict]:
+        query = np.asarray(params.get("query_embedding") or [], dtype=np.float32)
+        candidates = []
+        for row in self.tables["menu_items"].values():
+            if row.get("menu_id") != params.get("menu_uuid") or row.get("embedding") is None:
+                continue
+            if params.get("p_category") and (row.get("category") or "").lower() != params["p_category"].lower():
+                continue
+            if params.get("p_is_veg") is not None and row.get("is_veg") != params["p_is_veg"]:
+                continue
+            if params.get("p_price_max") is not None and (row.get("price") or 0) > float(params["p_price_max"]):
+                continue
+            candidates.append(row)
+        if not candidates or query.size == 0:
+            return []
+        matrix = np.asarray([row["embedding"] for row in candidates], dtype=np.float32)
+        distances = 1.0 - matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-9)
+        ranked = np.argsort(distances)[: int(params.get("p_limit") or 10)]
+        return [
+            {**{k: v for k, v in candidates[i].items() if k not in VECTOR_COLUMNS}, "distance": float(distances[i])}
+            for i in ranked
+        ]
+
+
+def _postgrest_error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"code": code, "message": message, "details": None, "hint": None})
+
+
+def create_supabase_app(faults: Faults, jwt_secret: str, store: Optional[PostgrestStore] = None) -> FastAPI:
+    app = FastAPI()
+    store = store or PostgrestStore()
+    app.state.store = store
+
+    def _rows_response(request: Request, rows: list, status_code: int = 200):
+        if "return=minimal" in request.headers.get("prefer", ""):
+            return Response(status_code=204 if status_code == 200 else status_code)
+        select = request.query_params.get("select", "*")
+        body = [store._project(row, select) for row in rows]
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(body) != 1:
+                return _postgrest_error(
+                    406, "PGRST116", f"JSON object requested, multiple (or no) rows returned ({len(body)} rows)"
+                )
+            body = body[0]
+        return JSONResponse(status_code=status_code, content=body, headers={"Content-Range": f"0-{max(0, len(rows) - 1)}/*"})
+
+    @app.get("/_bench/health")
+    async def health():
+        return {"status": "ok", "rows": {table: len(rows) for table, rows in store.tables.items()}}
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        if status_code := await faults.apply("supabase_rpc"):
+            return _postgrest_error(status_code, "BENCH", "Injected failure")
+        if function != "hybrid_search_items":
+            return _postgrest_error(404, "PGRST202", f"Could not find the function public.{function}")
+        return JSONResponse(store.hybrid_search_items(await request.json()))
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def table_endpoint(table: str, request: Request):
+        if status_code := await faults.apply("supabase_table"):
+            return _postgrest_error(status_code, "BENCH", "Injected failure")
+        try:
+            if request.method == "GET":
+                return _rows_response(request, store.query(table, request.query_params))
+            if request.method == "POST":
+                payload = await request.json()
+                rows = payload if isinstance(payload, list) else [payload]
+                upsert = "merge-duplicates" in request.headers.get("prefer", "")
+                return _rows_response(request, store.insert(table, rows, upsert), status_code=201)
+            if request.method == "PATCH":
+                return _rows_response(request, store.update(table, request.query_params, await request.json()))
+            return _rows_response(request, store.delete(table, request.query_params))
+        except PostgrestError as e:
+            return _postgrest_error(e.status_code, e.code, e.message)
+
+    def _user(claims: dict) -> dict:
+        return {
+            "id": claims["sub"],
+            "aud": claims.get("aud", "authenticated"),
+            "role": claims.get("role", "authenticated"),
+            "email": claims.get("email"),
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": "2024-01-01T00:00:00Z",
+        }
+
+    @app.get("/auth/v1/user")
+    async def get_user(request: Request):
+        if status_code := await faults.apply("supabase_auth"):
+            return JSONResponse(status_code=status_code, content={"msg": "Injected failure"})
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        try:
+            claims = jwt.decode(token, jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError as e:
+            return JSONResponse(status_code=401, content={"msg": str(e)})
+        return _user(claims)
+
+    @app.post("/auth/v1/token")
+    async def token(request: Request):
+        if status_code := await faults.apply("supabase_auth"):
+            return JSONResponse(status_code=status_code, content={"msg": "Injected failure"})
+        body = await request.json()
+        email = body.get("email") or "bench@example.com"
+        access_token = mint_token(jwt_secret, str(uuid.uuid5(uuid.NAMESPACE_URL, email)), email)
+        claims = jwt.decode(access_token, options={"verify_signature": False})
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "refresh_token": uuid.uuid4().hex,
+            "user": _user(claims),
+        }
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        return {"keys": []}
+
+    return app
+
+
+def mint_token(secret: str, user_id: str, email: Optional[str] = None, ttl_seconds: int = 3600) -> str:
+    """HS256 access token shaped like Supabase's (verifiable with SUPABASE_JWT_SECRET)."""
+    now = int(time.time())
+    claims = {"sub": user_id, "email": email, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + ttl_seconds}
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+# ---------------------------------------------------------------------------
+# Azure OpenAI
+# ---------------------------------------------------------------------------
+
+def _azure_error(status_code: int) -> JSONResponse:
+    headers = {"Retry-After": "1"} if status_code == 429 else {}
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"code": str(status_code), "message": "Injected failure"}},
+        headers=headers,
+    )
+
+
+def _has_image(messages: list) -> bool:
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list) and any(part.get("type") == "image_url" for part in content):
+            return True
+    return False
+
+
+def _image_seed(messages: list) -> int:
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def _completion(model: str, message: dict, finish_reason: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+    }
+
+
+def create_azure_app(faults: Faults, vision_items: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/_bench/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        if not _has_image(messages):
+            if status_code := await faults.apply("azure_chat"):
+                return _azure_error(status_code)
+            query = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+            message = {"role": "assistant", "content": None}
+            finish_reason = "stop"
+            if body.get("tools"):
+                message["tool_calls"] = [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": "search_menu_items", "arguments": json.dumps({"query": query})},
+                }]
+                finish_reason = "tool_calls"
+            else:
+                message["content"] = query
+            return _completion(deployment, message, finish_reason)
+
+        content = json.dumps({"menu_items": sample_menu_items(_image_seed(messages), vision_items)})
+        if not body.get("stream"):
+            if status_code := await faults.apply("azure_vision"):
+                return _azure_error(status_code)
+            return _completion(deployment, {"role": "assistant", "content": content}, "stop")
+
+        # Streaming: time to first token is ~30% of the latency, the rest is spread over the chunks
+        profile = faults.profile("azure_vision")
+        if profile.error_rate and faults.random.random() < profile.error_rate:
+            await asyncio.sleep(faults.delay_seconds("azure_vision") * 0.3)
+            return _azure_error(profile.error_status)
+        total = faults.delay_seconds("azure_vision")
+        chunks = [content[i:i + 40] for i in range(0, len(content), 40)]
+
+        async def events():
+            await asyncio.sleep(total * 0.3)
+            for chunk in chunks:
+                await asyncio.sleep(total * 0.7 / len(chunks))
+                data = {"choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        if status_code := await faults.apply("azure_embedding"):
+            return _azure_error(status_code)
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(str(text))
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(len(str(text).split()) for text in inputs)
+        return {"object": "list", "data": data, "model": deployment, "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    return app
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_service_options(values: list[str], default_second: float) -> dict[str, tuple[float, float]]:
+    """["azure_vision=4000:1000", "supabase=5"] -> {"azure_vision": (4000, 1000), "supabase": (5, default)}"""
+    options = {}
+    for value in values or []:
+        service, _, spec = value.partition("=")
+        first, _, second = spec.partition(":")
+        options[service.strip()] = (float(first), float(second) if second else default_second)
+    return options
+
+
+async def serve(args: argparse.Namespace) -> None:
+    latency = {**DEFAULT_LATENCY_MS, **parse_service_options(args.latency, 0.0)}
+    if args.no_latency:
+        latency = {}
+    errors = {service: (rate, int(status)) for service, (rate, status) in parse_service_options(args.errors, 503).items()}
+    faults = Faults(latency, errors, seed=args.seed)
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            create_supabase_app(faults, args.jwt_secret), host=args.host, port=args.supabase_port,
+            log_level="warning", access_log=False, backlog=4096,
+        )),
+        uvicorn.Server(uvicorn.Config(
+            create_azure_app(faults, args.vision_items), host=args.host, port=args.azure_port,
+            log_level="warning", access_log=False, backlog=4096,
+        )),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Supabase and Azure OpenAI servers for benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--supabase-port", type=int, default=54331)
+    parser.add_argument("--azure-port", type=int, default=54332)
+    parser.add_argument("--jwt-secret", default=DEFAULT_JWT_SECRET, help="HS256 secret for minted/verified tokens")
+    parser.add_argument("--latency", action="append", help="service=ms[:jitter_ms], e.g. azure_chat=800:200 (repeatable)")
+    parser.add_argument("--no-latency", action="store_true", help="Respond immediately (overrides the defaults)")
+    parser.add_argument("--errors", action="append", help="service=rate[:status], e.g. azure_embedding=0.05:429 (repeatable)")
+    parser.add_argument("--vision-items", type=int, default=15, help="Items returned per vision call")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and error injection")
+    asyncio.run(serve(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
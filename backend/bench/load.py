@@ -0,0 +1,536 @@
+"""
+Load benchmark for backend.main:app, run against the local Supabase/Azure stand-ins in
+backend/bench/fakes.py, so no live service or quota is involved.
+
+    python -m backend.bench.load                                # default mix, 30s at concurrency 32
+    python -m backend.bench.load --mix search=1 --concurrency 64
+    python -m backend.bench.load --workers 4 --scenario four-workers --compare 1a2b3c4
+    python -m backend.bench.load --fake-latency azure_embedding=300:50 --fake-errors azure_chat=0.05:429
+    python -m backend.bench.load --env LOCAL_SEARCH_ENABLED=true --scenario local-search
+
+The runner starts the fakes and a uvicorn instance of the app (pointed at the fakes, with
+rate limiting off and state in a temporary directory), seeds restaurants, menus and items
+through the API, then drives a weighted mix of the flows in MenuMind.postman_collection.json
+from closed-loop virtual users. It reports throughput, p50/p95/p99 per request and the
+per-stage breakdown the API returns in Server-Timing headers, and saves the result as
+bench_results/load/<scenario>/<commit>.json. Runs are only comparable within a scenario:
+reuse a scenario name only with the same parameters.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from PIL import Image, ImageDraw
+
+from backend.bench import results
+from backend.bench.fakes import DEFAULT_JWT_SECRET, mint_token, sample_menu_items
+
+COLLECTION_PATH = os.path.join(results.REPO_ROOT, "MenuMind.postman_collection.json")
+
+SEARCH_QUERIES = [
+    "spicy vegan starters", "something with paneer", "cheap pizza", "vegetarian pasta under 15",
+    "chicken curry", "light salad", "dessert with chocolate", "soup", "non veg main course",
+    "crispy snacks", "mild curry under $12", "garlic bread", "gluten free options", "ramen",
+    "best burger", "mango drink", "smoked meat", "house special", "veg biryani", "fish",
+]
+
+
+@dataclass
+class Step:
+    request: str  # Postman request name
+    capture: dict = field(default_factory=dict)  # variable -> key of the JSON response
+
+
+# Flows are sequences of Postman requests; a step's failure ends the flow
+FLOWS = {
+    "search": [Step("Hybrid RAG Search (Public)")],
+    "list_items": [Step("List Menu Items by Menu")],
+    "get_menu": [Step("Get Menu by ID")],
+    "get_item": [Step("Get Menu Item by ID")],
+    "list_menus": [Step("Get All Menus")],
+    "my_restaurant": [Step("Get My Restaurant")],
+    "item_crud": [
+        Step("Create Menu Item", capture={"item_id": "id"}),
+        Step("Update Menu Item"),
+        Step("Delete Menu Item"),
+    ],
+    "parse": [Step("Parse Menu Image")],
+}
+DEFAULT_MIX = "search=40,list_items=20,get_menu=10,get_item=10,list_menus=5,my_restaurant=5,item_crud=8,parse=2"
+
+
+class PostmanCollection:
+    """Request templates from a Postman v2.1 collection, by request name, with {{variable}} substitution."""
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            collection = json.load(f)
+        self.requests: dict[str, dict] = {}
+        self._collect(collection.get("item", []))
+
+    def _collect(self, items: list) -> None:
+        for item in items:
+            if "item" in item:
+                self._collect(item["item"])
+            else:
+                self.requests[item["name"]] = item["request"]
+
+    @staticmethod
+    def _substitute(text: str, variables: dict) -> str:
+        return re.sub(r"\{\{(\w+)\}\}", lambda m: str(variables.get(m.group(1), m.group(0))), text)
+
+    def build(
+        self,
+        name: str,
+        variables: dict,
+        params: Optional[dict] = None,
+        form: Optional[dict] = None,
+        upload: Optional[tuple] = None,
+    ) -> dict:
+        """httpx.request() keyword arguments; `params`/`form` override the collection's values."""
+        template = self.requests[name]
+        url = httpx.URL(self._substitute(template["url"]["raw"], variables))
+        if params:
+            url = url.copy_merge_params(params)
+        headers = {
+            header["key"]: self._substitute(header["value"], variables)
+            for header in template.get("header", [])
+            if not header.get("disabled")
+        }
+        request = {"method": template["method"], "url": str(url), "headers": headers}
+        body = template.get("body") or {}
+        if body.get("mode") == "raw":
+            request["content"] = self._substitute(body["raw"], variables).encode("utf-8")
+        elif body.get("mode") == "formdata":
+            data, files = {}, {}
+            for part in body["formdata"]:
+                if part.get("type") == "file":
+                    files[part["key"]] = upload
+                else:
+                    data[part["key"]] = self._substitute(part.get("value", ""), variables)
+            request["data"] = {**data, **(form or {})}
+            request["files"] = files
+        return request
+
+
+# ---------------------------------------------------------------------------
+# Processes
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode} before {url} came up")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def stop(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def app_environment(args: argparse.Namespace, supabase_url: str, azure_url: str, workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [results.REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-role-key",
+        "SUPABASE_ANON_KEY": "bench-anon-key",
+        "SUPABASE_JWT_SECRET": args.jwt_secret,
+        "AUTH_VERIFICATION_MODE": args.auth_mode,
+        "AZURE_OPENAI_API_KEY": "bench-key",
+        "AZURE_OPENAI_ENDPOINT": azure_url,
+        "AZURE_OPENAI_EMBEDDING_ENDPOINT": azure_url,
+        "AZURE_OPENAI_EMBEDDING_API_KEY": "bench-key",
+        "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "text-embedding-3-small",
+        "AZURE_OPENAI_EMBEDDING_API_VERSION": "2024-02-01",
+        "AZURE_OPENAI_VISION_URL": f"{azure_url}/openai/deployments/gpt-4o-mini/chat/completions?api-version=2025-01-01-preview",
+        "GEMINI_API_KEY": "bench-key",
+        "RATE_LIMIT_ENABLED": "false",
+        "RATE_LIMIT_DB_PATH": os.path.join(workdir, "rate_limits.sqlite3"),
+        "PARSE_CACHE_PATH": os.path.join(workdir, "parse_cache.sqlite3") if args.parse_cache else "",
+        "PARSE_JOBS_DB_PATH": os.path.join(workdir, "parse_jobs.sqlite3"),
+        "PARSE_JOBS_UPLOAD_DIR": os.path.join(workdir, "parse_jobs_uploads"),
+        "ENVIRONMENT": "benchmark",
+    }
+    for override in args.env or []:
+        key, _, value = override.partition("=")
+        env[key] = value
+    return env
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+def menu_images(count: int, seed: int = 0) -> list[bytes]:
+    """Menu-like JPEGs (text lines on a light page); distinct so parse-cache hits stay rare."""
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (1400, 2000), (250, 248, 240))
+        draw = ImageDraw.Draw(image)
+        for line in range(60):
+            y = 60 + line * 31
+            draw.rectangle((80, y, 80 + rng.randint(300, 900), y + 14), fill=(rng.randint(0, 80),) * 3)
+            draw.rectangle((1180, y, 1180 + rng.randint(60, 120), y + 14), fill=(40, 40, 40))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def parse_server_timing(header: Optional[str]) -> dict[str, tuple[float, int]]:
+    """'supabase_table;dur=12.3;desc="2 calls", total;dur=20.1' -> {stage: (ms, calls)}"""
+    stages = {}
+    for entry in (header or "").split(","):
+        parts = [part.strip() for part in entry.split(";")]
+        if not parts[0]:
+            continue
+        duration, calls = 0.0, 1
+        for part in parts[1:]:
+            if part.startswith("dur="):
+                duration = float(part[4:])
+            elif part.startswith("desc="):
+                match = re.match(r'desc="?(\d+) calls', part)
+                calls = int(match.group(1)) if match else 1
+        stages[parts[0]] = (duration, calls)
+    return stages
+
+
+class Recorder:
+    def __init__(self):
+        self.enabled = False
+        self.latencies: dict[str, list] = defaultdict(list)
+        self.statuses: dict[str, dict] = defaultdict(lambda: defaultdict(int))
+        self.stages: dict[str, dict] = defaultdict(lambda: defaultdict(list))
+        self.stage_calls: dict[str, dict] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, status: int, elapsed_ms: float, server_timing: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        self.statuses[name][status] += 1
+        if 0 < status < 400:
+            self.latencies[name].append(elapsed_ms)
+            for stage, (duration, calls) in parse_server_timing(server_timing).items():
+                self.stages[name][stage].append(duration)
+                self.stage_calls[name][stage] += calls
+
+
+@dataclass
+class Tenant:
+    variables: dict
+    item_ids: list
+
+
+class LoadRunner:
+    def __init__(self, args: argparse.Namespace, base_url: str, collection: PostmanCollection):
+        self.args = args
+        self.base_url = base_url
+        self.collection = collection
+        self.recorder = Recorder()
+        self.tenants: list[Tenant] = []
+        self.images = menu_images(4, seed=args.seed)
+        self.mix = parse_mix(args.mix)
+
+    def _variables(self, **extra) -> dict:
+        return {"base_url": self.base_url, **extra}
+
+    async def _send(self, client: httpx.AsyncClient, name: str, request: dict) -> tuple[int, Optional[dict]]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(**request)
+            status = response.status_code
+            body = response.content
+            server_timing = response.headers.get("server-timing")
+        except httpx.HTTPError:
+            status, body, server_timing = 0, b"", None
+        self.recorder.record(name, status, (time.perf_counter() - start) * 1000, server_timing)
+        if not body:
+            return status, None
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+    async def seed(self, client: httpx.AsyncClient) -> None:
+        """Creates one restaurant, menu and item set per tenant through the public API."""
+        for index in range(self.args.tenants):
+            user_id = str(uuid.uuid4())
+            variables = self._variables(jwt_token=mint_token(self.args.jwt_secret, user_id, f"bench{index}@example.com"))
+            status, restaurant = await self._send(client, "seed", self.collection.build("Create Restaurant", variables))
+            if status != 200:
+                raise RuntimeError(f"Seeding failed: Create Restaurant returned {status}: {restaurant}")
+            variables["restaurant_id"] = restaurant["id"]
+            status, menu = await self._send(client, "seed", self.collection.build("Create Menu", variables))
+            if status != 200:
+                raise RuntimeError(f"Seeding failed: Create Menu returned {status}: {menu}")
+            variables["id"] = menu["id"]
+
+            rows = "\n".join(json.dumps(item) for item in sample_menu_items(self.args.seed + index, self.args.items_per_menu))
+            status, report = await self._send(client, "seed", {
+                "method": "POST",
+                "url": f"{self.base_url}/menu-items/import",
+                "headers": {"Authorization": f"Bearer {variables['jwt_token']}"},
+                "data": {"menu_id": menu["id"], "format": "ndjson"},
+                "files": {"file": ("items.ndjson", rows.encode("utf-8"), "application/x-ndjson")},
+            })
+            if status != 200:
+                raise RuntimeError(f"Seeding failed: import returned {status}: {report}")
+            item_ids = [row["id"] for row in report["rows"] if row.get("id")]
+            self.tenants.append(Tenant(variables, item_ids))
+
+    async def run_flow(self, client: httpx.AsyncClient, flow: str, rng: random.Random) -> None:
+        tenant = rng.choice(self.tenants)
+        variables = {**tenant.variables, "item_id": rng.choice(tenant.item_ids)}
+        for step in FLOWS[flow]:
+            params, form, upload = None, None, None
+            if step.request == "Hybrid RAG Search (Public)":
+                params = {"query": rng.choice(SEARCH_QUERIES)}
+            elif step.request == "Parse Menu Image":
+                form = {"wait": "true"}
+                upload = ("menu.jpg", rng.choice(self.images), "image/jpeg")
+            request = self.collection.build(step.request, variables, params=params, form=form, upload=upload)
+            status, body = await self._send(client, step.request, request)
+            if not 0 < status < 400:
+                return
+            for variable, key in step.capture.items():
+                if isinstance(body, dict) and key in body:
+                    variables[variable] = body[key]
+
+    async def virtual_user(self, client: httpx.AsyncClient, deadline: float, seed: int) -> None:
+        rng = random.Random(seed)
+        flows, weights = zip(*self.mix.items())
+        while time.monotonic() < deadline:
+            await self.run_flow(client, rng.choices(flows, weights)[0], rng)
+
+    async def run(self) -> float:
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.args.request_timeout) as client:
+            await self.seed(client)
+            if self.args.warmup > 0:
+                deadline = time.monotonic() + self.args.warmup
+                await asyncio.gather(*(self.virtual_user(client, deadline, -i) for i in range(self.args.concurrency)))
+            self.recorder.enabled = True
+            started = time.monotonic()
+            deadline = started + self.args.duration
+            await asyncio.gather(
+                *(self.virtual_user(client, deadline, self.args.seed + i) for i in range(self.args.concurrency))
+            )
+            return time.monotonic() - started
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        flow, _, weight = part.partition("=")
+        flow = flow.strip()
+        if flow not in FLOWS:
+            raise SystemExit(f"Unknown flow {flow!r}; choose from {', '.join(FLOWS)}")
+        mix[flow] = float(weight or 1)
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    requests = {}
+    total_ok = total_errors = 0
+    all_latencies = []
+    for name in sorted(set(recorder.statuses)):
+        statuses = recorder.statuses[name]
+        ok = len(recorder.latencies[name])
+        errors = sum(count for status, count in statuses.items() if not 0 < status < 400)
+        total_ok += ok
+        total_errors += errors
+        all_latencies.extend(recorder.latencies[name])
+        stages = {}
+        for stage, durations in sorted(recorder.stages[name].items()):
+            summary = results.latency_summary(durations)
+            stages[stage] = {
+                "mean_ms": summary["mean_ms"],
+                "p95_ms": summary["p95_ms"],
+                "calls_per_request": round(recorder.stage_calls[name][stage] / ok, 3) if ok else 0,
+                "present_in": round(len(durations) / ok, 3) if ok else 0,
+            }
+        requests[name] = {
+            **results.latency_summary(recorder.latencies[name]),
+            "rps": round(ok / elapsed, 3),
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "stages": stages,
+        }
+    return {
+        "summary": {
+            **results.latency_summary(all_latencies),
+            "elapsed_s": round(elapsed, 3),
+            "rps": round(total_ok / elapsed, 3),
+            "errors": total_errors,
+            "error_rate": round(total_errors / max(1, total_ok + total_errors), 5),
+        },
+        "requests": requests,
+    }
+
+
+def print_report(result: dict, baseline: Optional[dict]) -> None:
+    summary = result["summary"]
+    parameters = result["parameters"]
+    print(f"\nMenuMind load benchmark  revision={result['revision']}  scenario={result['scenario']}")
+    print(
+        f"{summary['elapsed_s']:.1f}s at concurrency {parameters['concurrency']}, {parameters['workers']} worker(s): "
+        f"{summary.get('count', 0)} ok, {summary['errors']} errors ({summary['error_rate']:.2%}), {summary['rps']:.1f} req/s"
+    )
+    if baseline:
+        base = baseline["summary"]
+        print(
+            f"vs {baseline['revision']}: rps {results.format_delta(summary['rps'], base.get('rps'), lower_is_better=False)}, "
+            f"p95 {results.format_delta(summary.get('p95_ms'), base.get('p95_ms'))}, "
+            f"p99 {results.format_delta(summary.get('p99_ms'), base.get('p99_ms'))}"
+        )
+    header = f"\n{'request':<30} {'ok':>6} {'err':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    for name, stats in result["requests"].items():
+        line = (
+            f"{name[:30]:<30} {stats.get('count', 0):>6} {stats['errors']:>5} {stats['rps']:>7.1f} "
+            f"{stats.get('p50_ms', 0):>8.1f} {stats.get('p95_ms', 0):>8.1f} {stats.get('p99_ms', 0):>8.1f}"
+        )
+        if baseline and name in baseline["requests"]:
+            line += "        " + results.format_delta(stats.get("p95_ms"), baseline["requests"][name].get("p95_ms"))
+        print(line)
+    failures = [
+        f"{name}: " + ", ".join(f"{status or 'connection error'} x{count}" for status, count in stats["statuses"].items()
+                                if not 0 < int(status) < 400)
+        for name, stats in result["requests"].items() if stats["errors"]
+    ]
+    if failures:
+        print("\nFailed requests by status:\n  " + "\n  ".join(failures))
+    print("\nPer-stage time per request, from Server-Timing (mean / p95 ms, calls per request):")
+    for name, stats in result["requests"].items():
+        stages = [
+            f"{stage} {values['mean_ms']:.1f}/{values['p95_ms']:.1f} x{values['calls_per_request']:g}"
+            for stage, values in stats["stages"].items()
+        ]
+        if stages:
+            print(f"  {name}: " + ", ".join(stages))
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API against local Supabase/Azure fakes.")
+    parser.add_argument("--scenario", default="default", help="Result name; compare runs only within a scenario")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"flow=weight list; flows: {', '.join(FLOWS)}")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the measurement")
+    parser.add_argument("--concurrency", type=int, default=32, help="Closed-loop virtual users")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the app")
+    parser.add_argument("--tenants", type=int, default=5, help="Restaurants (each with one menu) to seed")
+    parser.add_argument("--items-per-menu", type=int, default=80)
+    parser.add_argument("--auth-mode", choices=["local", "remote"], default="local", help="AUTH_VERIFICATION_MODE for the app")
+    parser.add_argument("--parse-cache", action="store_true", help="Keep the parse-result cache enabled")
+    parser.add_argument("--env", action="append", help="Extra KEY=VALUE setting for the app (repeatable)")
+    parser.add_argument("--fake-latency", action="append", help="Passed to the fakes as --latency (repeatable)")
+    parser.add_argument("--fake-errors", action="append", help="Passed to the fakes as --errors (repeatable)")
+    parser.add_argument("--no-fake-latency", action="store_true", help="Fakes respond without added latency")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--jwt-secret", default=DEFAULT_JWT_SECRET)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", help="Baseline commit (or result file) to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Print the report without saving the result")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the app's temporary directory (logs)")
+    args = parser.parse_args(argv)
+
+    collection = PostmanCollection(COLLECTION_PATH)
+    supabase_port, azure_port, app_port = free_port(), free_port(), free_port()
+    supabase_url, azure_url = f"http://127.0.0.1:{supabase_port}", f"http://127.0.0.1:{azure_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+    workdir = tempfile.mkdtemp(prefix="menumind-bench-")
+    fakes = app = None
+    try:
+        fake_args = [
+            "--supabase-port", str(supabase_port), "--azure-port", str(azure_port),
+            "--jwt-secret", args.jwt_secret, "--seed", str(args.seed),
+        ]
+        fake_args += [arg for value in args.fake_latency or [] for arg in ("--latency", value)]
+        fake_args += [arg for value in args.fake_errors or [] for arg in ("--errors", value)]
+        if args.no_fake_latency:
+            fake_args.append("--no-latency")
+        with open(os.path.join(workdir, "fakes.out"), "w") as fakes_out:
+            fakes = subprocess.Popen(
+                [sys.executable, "-m", "backend.bench.fakes", *fake_args],
+                cwd=results.REPO_ROOT, stdout=fakes_out, stderr=subprocess.STDOUT,
+            )
+        wait_until_ready(f"{supabase_url}/_bench/health", fakes)
+        wait_until_ready(f"{azure_url}/_bench/health", fakes)
+
+        with open(os.path.join(workdir, "app.out"), "w") as app_out:
+            app = subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+                    "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+                ],
+                cwd=workdir, env=app_environment(args, supabase_url, azure_url, workdir),
+                stdout=app_out, stderr=subprocess.STDOUT,
+            )
+        wait_until_ready(f"{base_url}/metrics", app)
+
+        runner = LoadRunner(args, base_url, collection)
+        elapsed = asyncio.run(runner.run())
+    finally:
+        stop(app)
+        stop(fakes)
+        if args.keep_workdir:
+            print(f"App logs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    parameters = {
+        key: value for key, value in vars(args).items()
+        if key not in ("compare", "no_save", "keep_workdir", "scenario")
+    }
+    result = {**results.new_result("load", args.scenario, parameters), **summarize(runner.recorder, elapsed)}
+    baseline = results.load_result("load", args.scenario, args.compare) if args.compare else None
+    if args.compare and baseline is None:
+        print(f"No baseline result found for {args.compare!r} in scenario {args.scenario!r}")
+    elif baseline and baseline["parameters"] != parameters:
+        print(f"Warning: baseline {baseline['revision']} was run with different parameters")
+    print_report(result, baseline)
+    if not args.no_save:
+        print(f"\nSaved {results.save_result('load', args.scenario, result)}")
+
+
+if __name__ == "__main__":
+    main()
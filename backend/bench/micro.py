@@ -0,0 +1,143 @@
+"""
+Micro-benchmarks for the CPU-bound pieces of the request paths (no network involved).
+
+    python -m backend.bench.micro                    # run every case
+    python -m backend.bench.micro -k parse -k merge  # cases whose name contains a pattern
+    python -m backend.bench.micro --compare 1a2b3c4
+
+Each case is timed with timeit (auto-ranged loop count, best and median of --repeat runs,
+per call) and the result is saved as bench_results/micro/<scenario>/<commit>.json.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import statistics
+import timeit
+from typing import Callable, Optional
+
+# The backend modules read their settings at import; placeholders are enough here
+for _key in (
+    "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_EMBEDDING_ENDPOINT", "AZURE_OPENAI_EMBEDDING_API_KEY", "AZURE_OPENAI_EMBEDDING_DEPLOYMENT",
+    "AZURE_OPENAI_EMBEDDING_API_VERSION", "GEMINI_API_KEY",
+):
+    os.environ.setdefault(_key, "http://127.0.0.1:9" if _key.endswith(("_URL", "_ENDPOINT")) else "bench")
+os.environ.setdefault("PARSE_CACHE_PATH", "")
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from backend.bench import results  # noqa: E402
+from backend.bench.fakes import fake_embedding, sample_menu_items  # noqa: E402
+from backend.bench.load import menu_images  # noqa: E402
+from backend.core.embedding_codec import encode_embedding  # noqa: E402
+from backend.core.filter_extractor import extract_filters  # noqa: E402
+from backend.core.image_prep import perceptual_hash, prepare_image  # noqa: E402
+from backend.core.local_search import MenuIndex  # noqa: E402
+from backend.core.menu_pipeline import dedupe_key, merge_items, try_parse_json  # noqa: E402
+from backend.core.menu_stream import MenuItemStreamParser  # noqa: E402
+from backend.core.metrics import server_timing  # noqa: E402
+
+# Per-call INFO logs would dominate the timings (and the output)
+logging.disable(logging.INFO)
+
+
+def _large_photo() -> bytes:
+    # A phone-sized photo: noise defeats JPEG compression the way real texture does
+    pixels = np.random.default_rng(0).integers(0, 255, size=(4000, 3000, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _stream_parse(output: str) -> Callable[[], None]:
+    chunks = [output[i:i + 40] for i in range(0, len(output), 40)]
+
+    def run():
+        parser = MenuItemStreamParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+    return run
+
+
+def _local_search(items: list[dict]) -> Callable[[], None]:
+    index = MenuIndex([dict(item) for item in items])
+    query = fake_embedding("spicy paneer").tolist()
+    return lambda: index.search(query, "spicy paneer", category="Main Course", limit=10)
+
+
+def build_cases() -> dict[str, Callable[[], None]]:
+    items = sample_menu_items(0, 200)
+    vision_output = json.dumps({"menu_items": items[:40]}, indent=2)
+    tile_lists = [items[:120], items[80:200]]  # overlapping tiles
+    indexed = [
+        {**item, "id": str(index), "menu_id": "menu", "price": float(item["price"]),
+         "embedding": fake_embedding(item["name"] + str(index)).tolist()}
+        for index, item in enumerate(items)
+    ]
+    categories = sorted({item["category"] for item in items})
+    menu_photo = menu_images(1)[0]
+    large_photo = _large_photo()
+    vector = fake_embedding("vector")
+    timings = [("supabase_table", 0.012), ("azure_embedding", 0.08), ("supabase_table", 0.01), ("supabase_rpc", 0.03)]
+
+    return {
+        "filter_extract": lambda: extract_filters("spicy veg starters under $12", categories),
+        "vision_json_parse": lambda: try_parse_json(f"```json\n{vision_output}\n```"),
+        "vision_stream_parse": _stream_parse(vision_output),
+        "merge_items_240": lambda: merge_items(tile_lists),
+        "dedupe_keys_200": lambda: [dedupe_key(item) for item in items],
+        "encode_embedding_f16": lambda: encode_embedding(vector, "f16-base64"),
+        "prepare_image_menu": lambda: prepare_image(menu_photo, "image/jpeg"),
+        "prepare_image_12mp": lambda: prepare_image(large_photo, "image/jpeg"),
+        "perceptual_hash_menu": lambda: perceptual_hash(menu_photo),
+        "local_index_build_200": lambda: MenuIndex([dict(item) for item in indexed]),
+        "local_search_200": _local_search(indexed),
+        "server_timing_header": lambda: server_timing(timings, 0.2),
+    }
+
+
+def time_case(fn: Callable[[], None], repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    runs = [total / loops for total in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "loops": loops,
+        "best_us": round(min(runs) * 1e6, 3),
+        "median_us": round(statistics.median(runs) * 1e6, 3),
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for CPU-bound request-path code.")
+    parser.add_argument("-k", dest="patterns", action="append", help="Only cases whose name contains this (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--scenario", default="default")
+    parser.add_argument("--compare", help="Baseline commit (or result file) to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    cases = {
+        name: fn for name, fn in build_cases().items()
+        if not args.patterns or any(pattern in name for pattern in args.patterns)
+    }
+    result = results.new_result("micro", args.scenario, {"repeat": args.repeat, "cases": sorted(cases)})
+    result["cases"] = {}
+    baseline = results.load_result("micro", args.scenario, args.compare) if args.compare else None
+
+    print(f"MenuMind micro-benchmarks  revision={result['revision']}")
+    print(f"{'case':<24} {'best':>12} {'median':>12}  (per call)" + ("  best vs baseline" if baseline else ""))
+    for name, fn in cases.items():
+        stats = result["cases"][name] = time_case(fn, args.repeat)
+        line = f"{name:<24} {stats['best_us']:>10.1f}us {stats['median_us']:>10.1f}us"
+        if baseline and name in baseline.get("cases", {}):
+            line += "  " + results.format_delta(stats["best_us"], baseline["cases"][name]["best_us"])
+        print(line)
+    if not args.no_save:
+        print(f"\nSaved {results.save_result('micro', args.scenario, result)}")
+
+
+if __name__ == "__main__":
+    main()
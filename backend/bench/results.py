@@ -0,0 +1,93 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Optional
+
+import numpy as np
+
+# Benchmark results are stored as bench_results/<kind>/<scenario>/<commit>.json, so two commits
+# run with the same scenario name (and therefore the same parameters) can be compared directly.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench_results")
+
+
+def git_revision() -> str:
+    """Short commit hash, with "-dirty" when the working tree has uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def latency_summary(samples_ms: list[float]) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def result_path(kind: str, scenario: str, revision: str, results_dir: str = RESULTS_DIR) -> str:
+    return os.path.join(results_dir, kind, scenario, f"{revision}.json")
+
+
+def save_result(kind: str, scenario: str, result: dict, results_dir: str = RESULTS_DIR) -> str:
+    revision = result["revision"]
+    path = result_path(kind, scenario, revision, results_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_result(kind: str, scenario: str, ref: str, results_dir: str = RESULTS_DIR) -> Optional[dict]:
+    """`ref` is a result file path, or a commit whose result is looked up for this scenario."""
+    path = ref if os.path.exists(ref) else result_path(kind, scenario, ref, results_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def new_result(kind: str, scenario: str, parameters: dict) -> dict:
+    return {
+        "kind": kind,
+        "scenario": scenario,
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "parameters": parameters,
+    }
+
+
+def format_delta(current: Optional[float], baseline: Optional[float], lower_is_better: bool = True) -> str:
+    if current is None or baseline is None or baseline == 0:
+        return ""
+    change = (current - baseline) / baseline * 100
+    better = change < 0 if lower_is_better else change > 0
+    marker = "" if abs(change) < 5 else (" better" if better else " WORSE")
+    return f"{change:+.1f}%{marker}"
@@ -0,0 +1,52 @@
+from typing import Optional
+
+from openai import AsyncAzureOpenAI
+
+from backend.core.config import settings
+from backend.core.http_clients import get_async_http_client
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Long-lived async clients, created once per worker and shared by every request.
+# Both Azure clients sit on the worker's shared pooled HTTP client so keep-alive connections are reused.
+_chat_client: Optional[AsyncAzureOpenAI] = None
+_embedding_client: Optional[AsyncAzureOpenAI] = None
+
+
+def get_chat_client() -> AsyncAzureOpenAI:
+    global _chat_client
+    if _chat_client is None:
+        _chat_client = AsyncAzureOpenAI(
+            api_key=settings.azure_openai_api_key,
+            azure_endpoint=settings.azure_openai_endpoint,
+            api_version=settings.azure_openai_embedding_api_version,  # Assuming this version works for chat completions too
+            timeout=settings.ai_request_timeout_seconds,
+            http_client=get_async_http_client(),
+        )
+    return _chat_client
+
+
+def get_embedding_client() -> AsyncAzureOpenAI:
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = AsyncAzureOpenAI(
+            api_key=settings.azure_openai_embedding_api_key,
+            azure_endpoint=settings.azure_openai_embedding_endpoint,
+            api_version=settings.azure_openai_embedding_api_version,
+            timeout=settings.ai_request_timeout_seconds,
+            http_client=get_async_http_client(),
+        )
+    return _embedding_client
+
+
+def init_ai_clients() -> None:
+    get_chat_client()
+    get_embedding_client()
+    logger.info("Async Azure OpenAI clients initialised")
+
+
+def close_ai_clients() -> None:
+    # The pooled HTTP client underneath is closed with backend.core.http_clients
+    global _chat_client, _embedding_client
+    _chat_client = _embedding_client = None
@@ -7,6 +7,15 @@ class Settings(BaseSettings):
     supabase_url: str = Field(..., env="SUPABASE_URL")
     supabase_service_role_key: str = Field(..., env="SUPABASE_SERVICE_ROLE_KEY")
     supabase_anon_key: Optional[str] = Field(default=None, env="SUPABASE_ANON_KEY")
+    supabase_jwt_secret: Optional[str] = Field(default=None, env="SUPABASE_JWT_SECRET")
+
+    # Auth: "local" verifies JWTs in-process (falling back to Supabase Auth when no key is available),
+    # "remote" always asks Supabase Auth
+    auth_verification_mode: str = Field(default="local", env="AUTH_VERIFICATION_MODE")
+    auth_jwt_audience: str = Field(default="authenticated", env="AUTH_JWT_AUDIENCE")
+    auth_jwks_cache_seconds: int = Field(default=600, env="AUTH_JWKS_CACHE_SECONDS")
+    auth_user_cache_size: int = Field(default=10000, env="AUTH_USER_CACHE_SIZE")
+    auth_user_cache_max_ttl_seconds: int = Field(default=3600, env="AUTH_USER_CACHE_MAX_TTL_SECONDS")
 
     # Azure OpenAI (GPT-4o Vision + Embeddings)
     azure_openai_api_key: str = Field(..., env="AZURE_OPENAI_API_KEY")
@@ -15,10 +24,129 @@ class Settings(BaseSettings):
     azure_openai_embedding_api_key: str = Field(..., env="AZURE_OPENAI_EMBEDDING_API_KEY")
     azure_openai_embedding_deployment: str = Field(..., env="AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
     azure_openai_embedding_api_version: str = Field(..., env="AZURE_OPENAI_EMBEDDING_API_VERSION")
+    # Full chat-completions URL of the vision deployment used for menu parsing
+    azure_openai_vision_url: str = Field(
+        default="https://calllive-o4realtime-agent.openai.azure.com/openai/deployments/gpt-4o-mini/chat/completions?api-version=2025-01-01-preview",
+        env="AZURE_OPENAI_VISION_URL",
+    )
+    # Tag stored in menu_items.embedding_version; defaults to the deployment name
+    embedding_version: Optional[str] = Field(default=None, env="EMBEDDING_VERSION")
+    # Insert paths only write the tag once the embedding_version migration is applied
+    # (memory-bank/databaseSchema.md); the backfill CLI always writes it
+    embedding_version_tagging: bool = Field(default=False, env="EMBEDDING_VERSION_TAGGING")
+
+    # Shared async AI clients
+    ai_request_timeout_seconds: float = Field(default=30.0, env="AI_REQUEST_TIMEOUT_SECONDS")
+
+    # Pooled outbound HTTP clients (Supabase and Azure), one per worker
+    http_max_connections: int = Field(default=256, env="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=64, env="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry_seconds: float = Field(default=30.0, env="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    http_connect_timeout_seconds: float = Field(default=10.0, env="HTTP_CONNECT_TIMEOUT_SECONDS")
+    # Default for calls that do not pass their own timeout (matches supabase-py's PostgREST default)
+    http_timeout_seconds: float = Field(default=120.0, env="HTTP_TIMEOUT_SECONDS")
+
+    # Embedding batching (menu ingest)
+    embedding_batch_size: int = Field(default=64, env="EMBEDDING_BATCH_SIZE")
+    embedding_max_concurrency: int = Field(default=4, env="EMBEDDING_MAX_CONCURRENCY")
+    embedding_max_retries: int = Field(default=2, env="EMBEDDING_MAX_RETRIES")
+
+    # Query embedding cache (search)
+    query_embedding_cache_size: int = Field(default=2048, env="QUERY_EMBEDDING_CACHE_SIZE")
+    query_embedding_cache_ttl_seconds: int = Field(default=86400, env="QUERY_EMBEDDING_CACHE_TTL_SECONDS")
+    query_embedding_cache_path: Optional[str] = Field(default=None, env="QUERY_EMBEDDING_CACHE_PATH")
+    query_embedding_cache_warm_start: int = Field(default=200, env="QUERY_EMBEDDING_CACHE_WARM_START")
+    query_embedding_cache_flush_seconds: float = Field(default=5.0, env="QUERY_EMBEDDING_CACHE_FLUSH_SECONDS")
+
+    # Local filter extraction (search)
+    local_filter_extraction_enabled: bool = Field(default=True, env="LOCAL_FILTER_EXTRACTION_ENABLED")
+    local_filter_min_confidence: float = Field(default=0.75, env="LOCAL_FILTER_MIN_CONFIDENCE")
+
+    # Staged search deadlines
+    search_filter_deadline_ms: int = Field(default=1500, env="SEARCH_FILTER_DEADLINE_MS")
+    search_embedding_deadline_ms: int = Field(default=1000, env="SEARCH_EMBEDDING_DEADLINE_MS")
+    search_rpc_deadline_ms: int = Field(default=2000, env="SEARCH_RPC_DEADLINE_MS")
+    search_speculative_similarity: float = Field(default=0.8, env="SEARCH_SPECULATIVE_SIMILARITY")
+
+    # In-process hybrid search engine (alternative to the hybrid_search_items RPC)
+    local_search_enabled: bool = Field(default=False, env="LOCAL_SEARCH_ENABLED")
+    local_search_max_menus: int = Field(default=256, env="LOCAL_SEARCH_MAX_MENUS")
+    local_search_ttl_seconds: int = Field(default=300, env="LOCAL_SEARCH_TTL_SECONDS")
 
     # Google Gemini
     gemini_api_key: str = Field(..., env="GEMINI_API_KEY")
 
+    # Ownership / authorization cache
+    ownership_cache_size: int = Field(default=4096, env="OWNERSHIP_CACHE_SIZE")
+    ownership_cache_ttl_seconds: int = Field(default=30, env="OWNERSHIP_CACHE_TTL_SECONDS")
+
+    # Public menu read cache
+    menu_read_cache_size: int = Field(default=1024, env="MENU_READ_CACHE_SIZE")
+    menu_read_cache_ttl_seconds: int = Field(default=300, env="MENU_READ_CACHE_TTL_SECONDS")
+    # Per-menu change counters shared by every worker and CLI on the host (checked on each cached read)
+    menu_generations_db_path: str = Field(default="menu_generations.sqlite3", env="MENU_GENERATIONS_DB_PATH")
+
+    # List endpoints (keyset pagination)
+    list_page_size_default: int = Field(default=100, env="LIST_PAGE_SIZE_DEFAULT")
+    list_page_size_max: int = Field(default=1000, env="LIST_PAGE_SIZE_MAX")
+
+    # Bulk menu item import
+    import_chunk_size: int = Field(default=500, env="IMPORT_CHUNK_SIZE")
+    import_max_rows: int = Field(default=20000, env="IMPORT_MAX_ROWS")
+
+    # Vision extraction (menu parsing)
+    vision_max_dimension: int = Field(default=3072, env="VISION_MAX_DIMENSION")
+    vision_tile_size: int = Field(default=1536, env="VISION_TILE_SIZE")
+    vision_tile_overlap: float = Field(default=0.1, env="VISION_TILE_OVERLAP")
+    vision_max_tiles: int = Field(default=6, env="VISION_MAX_TILES")
+    vision_jpeg_quality: int = Field(default=85, env="VISION_JPEG_QUALITY")
+    vision_max_concurrency: int = Field(default=8, env="VISION_MAX_CONCURRENCY")
+    pdf_render_dpi: int = Field(default=150, env="PDF_RENDER_DPI")
+    pdf_max_pages: int = Field(default=30, env="PDF_MAX_PAGES")
+    parse_max_files: int = Field(default=20, env="PARSE_MAX_FILES")
+
+    # Parsed-item dedupe: optional embedding near-duplicate pass (same price, cosine >= threshold)
+    dedupe_semantic_enabled: bool = Field(default=False, env="DEDUPE_SEMANTIC_ENABLED")
+    dedupe_similarity_threshold: float = Field(default=0.95, env="DEDUPE_SIMILARITY_THRESHOLD")
+
+    # Parse-result cache (skips the vision call for repeat uploads)
+    parse_cache_path: Optional[str] = Field(default="parse_cache.sqlite3", env="PARSE_CACHE_PATH")
+    parse_cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="PARSE_CACHE_MAX_BYTES")
+    # Near-duplicate lookup (perceptual hash) is off by default: it cannot tell a photo from one with an
+    # edited price or line. When on, matches are limited to the same menu and PARSE_CACHE_MAX_DISTANCE
+    # bits (out of 256).
+    parse_cache_perceptual_enabled: bool = Field(default=False, env="PARSE_CACHE_PERCEPTUAL_ENABLED")
+    parse_cache_max_distance: int = Field(default=4, env="PARSE_CACHE_MAX_DISTANCE")
+
+    # Menu parsing job queue
+    parse_workers: int = Field(default=2, env="PARSE_WORKERS")
+    parse_jobs_db_path: str = Field(default="parse_jobs.sqlite3", env="PARSE_JOBS_DB_PATH")
+    parse_jobs_upload_dir: str = Field(default="parse_jobs_uploads", env="PARSE_JOBS_UPLOAD_DIR")
+    parse_job_poll_seconds: float = Field(default=2.0, env="PARSE_JOB_POLL_SECONDS")
+    # Each process heartbeats the jobs it runs; running jobs without a heartbeat for this long are requeued
+    parse_job_heartbeat_seconds: float = Field(default=10.0, env="PARSE_JOB_HEARTBEAT_SECONDS")
+    parse_job_stale_seconds: int = Field(default=60, env="PARSE_JOB_STALE_SECONDS")
+    # Claims allowed before a job whose runs keep dying (e.g. it crashes the worker) is failed
+    parse_job_max_attempts: int = Field(default=3, env="PARSE_JOB_MAX_ATTEMPTS")
+
+    # Rate limiting (token buckets shared across workers)
+    rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    rate_limit_db_path: str = Field(default="rate_limits.sqlite3", env="RATE_LIMIT_DB_PATH")
+    rate_limit_capacity: float = Field(default=1000, env="RATE_LIMIT_CAPACITY")
+    rate_limit_refill_per_minute: float = Field(default=500, env="RATE_LIMIT_REFILL_PER_MINUTE")
+    # Per-client (IP) bucket in front of each restaurant's shared bucket on public endpoints
+    rate_limit_client_capacity: float = Field(default=100, env="RATE_LIMIT_CLIENT_CAPACITY")
+    rate_limit_client_refill_per_minute: float = Field(default=60, env="RATE_LIMIT_CLIENT_REFILL_PER_MINUTE")
+    # Tokens per request by endpoint; env value is JSON, e.g. {"search": 10, "parse_menu": 250}
+    rate_limit_costs: dict[str, float] = Field(
+        default={"search": 5, "parse_menu": 250, "import_menu_items": 100},
+        env="RATE_LIMIT_COSTS",
+    )
+
+    # Logging
+    log_max_field_chars: int = Field(default=2000, env="LOG_MAX_FIELD_CHARS")
+    log_sample_every: int = Field(default=50, env="LOG_SAMPLE_EVERY")
+
     # Other
     environment: str = Field(default="development", env="ENVIRONMENT")
 
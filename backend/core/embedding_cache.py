@@ -0,0 +1,221 @@
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Optional
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, trims surrounding punctuation and collapses whitespace."""
+    return _WHITESPACE.sub(" ", query.strip().lower()).strip(" .,!?;:'\"")
+
+
+class QueryEmbeddingCache:
+    """
+    Caches query embeddings keyed by (normalized query, deployment, api version).
+    Entries live in a bounded in-memory LRU with a TTL; when `path` is set they are
+    also persisted to SQLite together with a lookup counter, so a restarted worker
+    can warm up from the most frequently searched queries.
+    New entries and lookup counts are buffered in memory and written by a background
+    thread every QUERY_EMBEDDING_CACHE_FLUSH_SECONDS (and on stop), so lookups on the
+    event loop never touch SQLite; `load` reads it and is meant for a worker thread.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending_puts: dict[str, tuple] = {}
+        self._pending_lookups: Counter = Counter()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.disk_hits = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    cache_key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    deployment TEXT NOT NULL,
+                    api_version TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    lookups INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._db.commit()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    @staticmethod
+    def _key(normalized: str) -> str:
+        return "|".join([
+            settings.azure_openai_embedding_deployment,
+            settings.azure_openai_embedding_api_version,
+            normalized,
+        ])
+
+    def get(self, query: str) -> Optional[list]:
+        """In-memory lookup only; safe to call on the event loop."""
+        key = self._key(normalize_query(query))
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            self._record_lookup(key)
+        return embedding
+
+    def load(self, query: str) -> Optional[list]:
+        """SQLite lookup for a query missing from memory. Blocking; call it from a worker thread."""
+        if self._db is None:
+            return None
+        key = self._key(normalize_query(query))
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT embedding FROM query_embeddings WHERE cache_key = ? AND created_at > ?",
+                (key, time.time() - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            return None
+        embedding = array("f", row[0]).tolist()
+        # Promote to memory; the disk lookup was a miss for the LRU but saved an API call
+        self.disk_hits += 1
+        self._memory.set(key, embedding)
+        self._record_lookup(key)
+        return embedding
+
+    def put(self, query: str, embedding: list) -> None:
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+        self._memory.set(key, embedding)
+        if self._db is None:
+            return
+        with self._pending_lock:
+            self._pending_puts[key] = (normalized, array("f", embedding).tobytes(), time.time())
+            self._pending_lookups[key] += 1
+
+    def _record_lookup(self, key: str) -> None:
+        if self._db is None:
+            return
+        with self._pending_lock:
+            self._pending_lookups[key] += 1
+
+    def flush(self) -> None:
+        """Writes buffered entries and lookup counts to SQLite in one transaction."""
+        if self._db is None:
+            return
+        with self._pending_lock:
+            puts, self._pending_puts = self._pending_puts, {}
+            lookups, self._pending_lookups = self._pending_lookups, Counter()
+        if not puts and not lookups:
+            return
+        deployment = settings.azure_openai_embedding_deployment
+        api_version = settings.azure_openai_embedding_api_version
+        with self._db_lock:
+            self._db.executemany(
+                """
+                INSERT INTO query_embeddings (cache_key, query, deployment, api_version, embedding, created_at, lookups)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    embedding = excluded.embedding,
+                    created_at = excluded.created_at,
+                    lookups = lookups + excluded.lookups
+                """,
+                [
+                    (key, normalized, deployment, api_version, blob, created_at, lookups.pop(key, 0))
+                    for key, (normalized, blob, created_at) in puts.items()
+                ],
+            )
+            self._db.executemany(
+                "UPDATE query_embeddings SET lookups = lookups + ? WHERE cache_key = ?",
+                [(count, key) for key, count in lookups.items()],
+            )
+            self._db.commit()
+
+    def _flush_loop(self) -> None:
+        while not self._stopping.wait(settings.query_embedding_cache_flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Query embedding cache flush failed: {str(e)}")
+
+    def start(self) -> None:
+        if self._db is None or self._flusher is not None:
+            return
+        self._stopping.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="query-embedding-flush", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        if self._flusher is not None:
+            self._stopping.set()
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Query embedding cache flush failed: {str(e)}")
+
+    def warm_start(self, limit: int) -> int:
+        """Loads the `limit` most frequently looked-up, unexpired queries into memory."""
+        if self._db is None or limit <= 0:
+            return 0
+        with self._db_lock:
+            rows = self._db.execute(
+                """
+                SELECT cache_key, embedding FROM query_embeddings
+                WHERE deployment = ? AND api_version = ? AND created_at > ?
+                ORDER BY lookups DESC LIMIT ?
+                """,
+                (
+                    settings.azure_openai_embedding_deployment,
+                    settings.azure_openai_embedding_api_version,
+                    time.time() - self.ttl_seconds,
+                    limit,
+                ),
+            ).fetchall()
+        # Insert least frequent first so the hottest queries end up most recently used
+        for key, blob in reversed(rows):
+            self._memory.set(key, array("f", blob).tolist())
+        logger.info(f"Query embedding cache warmed with {len(rows)} entries")
+        return len(rows)
+
+    def stats(self) -> dict:
+        memory_hits = self._memory.hits
+        lookups = memory_hits + self._memory.misses
+        hits = memory_hits + self.disk_hits
+        return {
+            "size": len(self._memory),
+            "max_size": self._memory.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+            "lookups": lookups,
+            "memory_hits": memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "embedding_calls_saved": hits,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+    path=settings.query_embedding_cache_path,
+)
@@ -0,0 +1,44 @@
+import base64
+import json
+from typing import Optional
+
+import numpy as np
+
+# Compact wire formats for embeddings: base64 of the little-endian float32/float16 bytes.
+# A 1536-d vector is ~8 KB as f32-base64 and ~4 KB as f16-base64, versus ~30 KB of JSON floats.
+BINARY_FORMATS = {
+    "f32-base64": np.dtype("<f4"),
+    "f16-base64": np.dtype("<f2"),
+}
+
+
+def to_vector(value) -> Optional[np.ndarray]:
+    """Parses a pgvector text value ("[0.1,0.2,...]") or a list into a float32 array."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value.strip().strip("[]")
+        if not text:
+            return None
+        vector = np.fromstring(text, dtype=np.float32, sep=",")
+    else:
+        vector = np.asarray(value, dtype=np.float32)
+    return vector if vector.size else None
+
+
+def encode_embedding(vector: np.ndarray, embedding_format: str) -> str:
+    return base64.b64encode(vector.astype(BINARY_FORMATS[embedding_format]).tobytes()).decode("ascii")
+
+
+def decode_embedding(data: str, embedding_format: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=BINARY_FORMATS[embedding_format]).astype(np.float32)
+
+
+def legacy_list(value) -> Optional[list]:
+    """The JSON float list the API has always returned."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except Exception:
+            return None
+    return value if isinstance(value, list) else None
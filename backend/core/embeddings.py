@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+
+from backend.core.config import settings
+from backend.core.http_clients import get_http_client
+from backend.core.logging_config import get_logger
+from backend.core.metrics import bind_context, timed
+
+logger = get_logger(__name__)
+
+
+class EmbeddingBatchError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def embedding_version() -> str:
+    """Tag recorded with every stored embedding, so rows from an older deployment can be found and re-embedded."""
+    return settings.embedding_version or settings.azure_openai_embedding_deployment
+
+
+def _embeddings_url() -> str:
+    endpoint = settings.azure_openai_embedding_endpoint
+    deployment = settings.azure_openai_embedding_deployment
+    api_version = settings.azure_openai_embedding_api_version
+    return f"{endpoint}/openai/deployments/{deployment}/embeddings?api-version={api_version}"
+
+
+def _post_embedding_batch(texts: list[str]) -> dict[int, list]:
+    """
+    Sends one embeddings request for a list of texts.
+    Returns {position in texts: embedding} for every item present in the response.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": settings.azure_openai_embedding_api_key,
+    }
+    try:
+        with timed("azure_embedding"):
+            # Shared pooled client, so batched requests reuse keep-alive connections
+            response = get_http_client().post(_embeddings_url(), headers=headers, json={"input": texts}, timeout=30)
+    except httpx.HTTPError as e:
+        raise EmbeddingBatchError(f"Embedding request failed: {str(e)}")
+    if not response.is_success:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise EmbeddingBatchError(
+            f"Embedding API error: {response.status_code} - {response.text}",
+            retry_after=retry_after,
+        )
+    # A 200 with an unexpected body fails the batch like an error status, so it is retried
+    try:
+        data = response.json().get("data") or []
+        results = {}
+        for position, entry in enumerate(data):
+            index = entry.get("index", position)
+            embedding = entry.get("embedding")
+            if embedding is not None and 0 <= index < len(texts):
+                results[index] = embedding
+    except (ValueError, TypeError, AttributeError) as e:
+        raise EmbeddingBatchError(f"Unexpected embedding response: {str(e)} - {response.text[:200]}")
+    return results
+
+
+def embed_texts(texts: list[str]) -> list[Optional[list]]:
+    """
+    Embeds many texts with as few Azure round trips as possible.
+    Texts are packed into batches of `embedding_batch_size`, up to
+    `embedding_max_concurrency` batches are in flight at once, and only the
+    items that failed are retried (in smaller batches, so one bad input cannot
+    sink its neighbours). Returns one embedding per input, None where it failed.
+    """
+    results: list[Optional[list]] = [None] * len(texts)
+    pending = [i for i, text in enumerate(texts) if text and text.strip()]
+    batch_size = max(1, settings.embedding_batch_size)
+    max_workers = max(1, settings.embedding_max_concurrency)
+
+    for attempt in range(settings.embedding_max_retries + 1):
+        if not pending:
+            break
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        failed = []
+        retry_after = 0.0
+
+        def run_batch(indices):
+            return indices, _post_embedding_batch([texts[i] for i in indices])
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            futures = [pool.submit(bind_context(run_batch), batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    indices, embedded = future.result()
+                except EmbeddingBatchError as e:
+                    logger.error(f"Embedding batch of {len(batch)} failed (attempt {attempt + 1}): {str(e)}")
+                    retry_after = max(retry_after, e.retry_after or 0.0)
+                    failed.extend(batch)
+                    continue
+                for position, index in enumerate(indices):
+                    if position in embedded:
+                        results[index] = embedded[position]
+                    else:
+                        failed.append(index)
+
+        pending = sorted(failed)
+        if pending and attempt < settings.embedding_max_retries:
+            batch_size = max(1, batch_size // 2)
+            delay = max(retry_after, 0.5 * (2 ** attempt))
+            logger.warning(f"Retrying {len(pending)} failed embeddings in {delay:.1f}s with batch size {batch_size}")
+            time.sleep(delay)
+
+    if pending:
+        logger.error(f"Embedding generation failed for {len(pending)} of {len(texts)} texts after retries")
+    return results
+
+
+def get_embedding(text: str) -> Optional[list]:
+    """
+    Calls Azure OpenAI Embedding endpoint to get embedding for the given text.
+    """
+    try:
+        return embed_texts([text])[0]
+    except Exception as e:
+        logger.error(f"Embedding generation failed: {str(e)}", exc_info=True)
+        return None
@@ -0,0 +1,99 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# "under $15", "below 200", "less than ₹300", "upto 12.50", "< 10"
+_PRICE_MAX = re.compile(
+    r"\b(?:under|below|less\s+than|cheaper\s+than|max(?:imum)?|up\s*to|within|<=?)\s*"
+    r"(?:rs\.?|inr|usd|₹|\$)?\s*(\d+(?:\.\d+)?)\s*(?:rs\.?|rupees|dollars|bucks|inr|usd|/-)?",
+    re.IGNORECASE,
+)
+# "15 dollars or less", "$20 max"
+_PRICE_MAX_SUFFIX = re.compile(
+    r"(?:rs\.?|inr|usd|₹|\$)?\s*(\d+(?:\.\d+)?)\s*(?:rs\.?|rupees|dollars|bucks)?\s+(?:or\s+less|and\s+under|max(?:imum)?)\b",
+    re.IGNORECASE,
+)
+_NON_VEG = re.compile(r"\bnon[\s-]?veg(?:etarian)?\b", re.IGNORECASE)
+_VEG = re.compile(r"\b(?:pure\s+)?(?:veg|vegetarian|vegan|veggie)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"\d")
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Phrases that imply a filter the rules cannot express reliably; leave these to the LLM
+_AMBIGUOUS_TERMS = (
+    "cheap", "affordable", "budget", "inexpensive", "expensive", "pricey", "premium",
+    "between", "around", "about", "approx", "over", "above", "more than", "at least",
+    "without", "no ", "not ", "except", "excluding", "free", "instead",
+    "healthy", "light", "kids", "jain", "egg",
+)
+
+_MAX_CONFIDENT_WORDS = 8
+
+
+@dataclass
+class ExtractedFilters:
+    query: str
+    category: Optional[str] = None
+    is_veg: Optional[bool] = None
+    price_max: Optional[float] = None
+    confidence: float = 1.0
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def _match_category(text: str, categories: Iterable[str]) -> tuple[Optional[str], Optional[re.Match]]:
+    """Finds the longest menu category mentioned in the text, tolerating plural/singular."""
+    best, best_match = None, None
+    for category in categories:
+        words = [_singular(w) for w in _WORD.findall(category.lower())]
+        if not words:
+            continue
+        pattern = r"\b" + r"\s+".join(re.escape(w) + r"s?" for w in words) + r"\b"
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match and (best_match is None or len(match.group(0)) > len(best_match.group(0))):
+            best, best_match = category, match
+    return best, best_match
+
+
+def extract_filters(query: str, categories: Iterable[str] = ()) -> ExtractedFilters:
+    """
+    Deterministically pulls price ceiling, veg preference and menu category out of a
+    diner query. `confidence` drops when the query contains phrasing the rules cannot
+    interpret, signalling that the LLM extractor should be used instead.
+    """
+    result = ExtractedFilters(query=query)
+    remainder = query
+
+    match = _PRICE_MAX.search(remainder) or _PRICE_MAX_SUFFIX.search(remainder)
+    if match:
+        result.price_max = float(match.group(1))
+        remainder = remainder[:match.start()] + " " + remainder[match.end():]
+
+    match = _NON_VEG.search(remainder)
+    if match:
+        result.is_veg = False
+    else:
+        match = _VEG.search(remainder)
+        if match:
+            result.is_veg = True
+    if match:
+        remainder = remainder[:match.start()] + " " + remainder[match.end():]
+
+    category, match = _match_category(remainder, categories)
+    if match:
+        result.category = category
+        remainder = remainder[:match.start()] + " " + remainder[match.end():]
+
+    remainder = re.sub(r"\s+", " ", remainder).strip(" ,.?!")
+    result.query = remainder or query
+
+    lowered = f" {remainder.lower()} "
+    if any(term in lowered for term in _AMBIGUOUS_TERMS):
+        result.confidence = 0.4
+    elif _NUMBER.search(remainder):
+        # A number we could not attach to a price phrase
+        result.confidence = 0.5
+    elif len(_WORD.findall(lowered)) > _MAX_CONFIDENT_WORDS:
+        result.confidence = 0.6
+    return result
@@ -0,0 +1,52 @@
+from typing import Optional
+
+import httpx
+
+from backend.core.config import settings
+from backend.core.metrics import AsyncTimedTransport, TimedTransport
+
+# One pooled HTTP client per worker for every outbound integration: Supabase REST/Auth
+# (through supabase-py), Azure OpenAI chat/embeddings (through the openai SDK) and the raw
+# vision and token calls. Connections are kept alive and reused, so a call only pays the
+# TCP+TLS handshake when the pool has no idle connection to that host.
+# The async client serves the event loop; code that runs in worker threads (parse jobs,
+# bulk import, the backfill CLI) uses the sync client, which is safe to share across threads.
+
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds)
+
+
+def get_http_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        # Limits go on the transport: httpx ignores client-level limits when a transport is given
+        _client = httpx.Client(transport=TimedTransport(limits=_limits()), timeout=_timeout())
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(transport=AsyncTimedTransport(limits=_limits()), timeout=_timeout())
+    return _async_client
+
+
+async def close_http_clients() -> None:
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+    if _client is not None:
+        _client.close()
+    _client = _async_client = None
@@ -0,0 +1,140 @@
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pymupdf
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+from backend.core.metrics import bind_context
+
+logger = get_logger(__name__)
+
+
+def _encode_jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=settings.vision_jpeg_quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _fit(image: Image.Image, max_dimension: int) -> Image.Image:
+    if max(image.size) <= max_dimension:
+        return image
+    scale = max_dimension / max(image.size)
+    return image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+
+def _tile_boxes(width: int, height: int, tile_size: int, overlap: float) -> list[tuple[int, int, int, int]]:
+    rows = math.ceil(height / tile_size)
+    cols = math.ceil(width / tile_size)
+    tile_h = math.ceil(height / rows)
+    tile_w = math.ceil(width / cols)
+    pad_h = int(tile_h * overlap)
+    pad_w = int(tile_w * overlap)
+    boxes = []
+    for row in range(rows):
+        for col in range(cols):
+            boxes.append((
+                max(0, col * tile_w - pad_w),
+                max(0, row * tile_h - pad_h),
+                min(width, (col + 1) * tile_w + pad_w),
+                min(height, (row + 1) * tile_h + pad_h),
+            ))
+    return boxes
+
+
+def prepare_image(image_bytes: bytes, content_type: str) -> list[tuple[bytes, str]]:
+    """
+    Downsizes and recompresses an uploaded menu image for the vision model, splitting tall or
+    dense images into overlapping tiles (row-major, reading order). Returns [(bytes, content_type)].
+    Images Pillow cannot read are passed through unchanged as a single tile.
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Image preprocessing skipped, sending original upload: {str(e)}")
+        return [(image_bytes, content_type)]
+
+    tile_size = settings.vision_tile_size
+    image = _fit(image, settings.vision_max_dimension)
+
+    # Anything that fits (with some slack) in one tile is sent whole
+    if image.width <= tile_size * 1.25 and image.height <= tile_size * 1.25:
+        tiles = [_fit(image, tile_size)]
+    else:
+        boxes = _tile_boxes(image.width, image.height, tile_size, settings.vision_tile_overlap)
+        while len(boxes) > settings.vision_max_tiles:
+            tile_size = int(tile_size * 1.25)
+            boxes = _tile_boxes(image.width, image.height, tile_size, settings.vision_tile_overlap)
+        tiles = [_fit(image.crop(box), tile_size) for box in boxes]
+
+    encoded = [(_encode_jpeg(tile), "image/jpeg") for tile in tiles]
+    logger.info(
+        f"Preprocessed image {len(image_bytes)} bytes -> {len(encoded)} tile(s), "
+        f"{sum(len(data) for data, _ in encoded)} bytes"
+    )
+    return encoded
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[tuple[int, float]]:
+    """
+    256-bit difference hash (dHash) of the image plus its aspect ratio. Recompressed or
+    resized copies of the same photo land within a few bits of each other.
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        aspect = round(image.width / image.height, 2)
+        pixels = list(image.convert("L").resize((17, 16), Image.LANCZOS).getdata())
+    except (UnidentifiedImageError, OSError, ZeroDivisionError):
+        return None
+    bits = 0
+    for row in range(16):
+        for col in range(16):
+            bits = (bits << 1) | (pixels[row * 17 + col] > pixels[row * 17 + col + 1])
+    return bits, aspect
+
+
+def is_pdf(data: bytes, content_type: Optional[str] = None) -> bool:
+    return content_type == "application/pdf" or data[:5] == b"%PDF-"
+
+
+def rasterize_pdf(data: bytes) -> list[bytes]:
+    """Renders each PDF page (up to PDF_MAX_PAGES) to PNG at PDF_RENDER_DPI. Unreadable PDFs yield no pages."""
+    try:
+        document = pymupdf.open(stream=data, filetype="pdf")
+    except Exception as e:
+        logger.warning(f"Could not open PDF upload: {str(e)}")
+        return []
+    with document:
+        if document.page_count > settings.pdf_max_pages:
+            logger.warning(
+                f"PDF has {document.page_count} pages, only the first {settings.pdf_max_pages} are parsed"
+            )
+        return [
+            page.get_pixmap(dpi=settings.pdf_render_dpi).tobytes("png")
+            for page in document.pages(0, min(document.page_count, settings.pdf_max_pages))
+        ]
+
+
+def prepare_uploads(files: list[tuple[bytes, Optional[str]]]) -> list[tuple[bytes, str]]:
+    """
+    Expands a set of uploads (images and/or PDFs, in upload order) into the vision inputs:
+    each PDF page is rasterized and every page/image then goes through prepare_image.
+    """
+    pages: list[tuple[bytes, str]] = []
+    for data, content_type in files:
+        if is_pdf(data, content_type):
+            pages.extend((page, "image/png") for page in rasterize_pdf(data))
+        else:
+            pages.append((data, content_type or "image/jpeg"))
+
+    if len(pages) > 1:
+        # Decoding/resizing is CPU-bound but Pillow releases the GIL, so pages prepare in parallel
+        with ThreadPoolExecutor(max_workers=min(len(pages), settings.vision_max_concurrency)) as pool:
+            prepared = list(pool.map(bind_context(lambda page: prepare_image(*page)), pages))
+    else:
+        prepared = [prepare_image(*page) for page in pages]
+    return [tile for tiles in prepared for tile in tiles]
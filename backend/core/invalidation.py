@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# In-process caches that hold per-menu state register here and are told whenever
+# a write path changes a menu or its items. Every change also bumps the menu's generation
+# in SQLite, shared by all worker processes and the CLIs on the host, so caches that must
+# not serve stale data across workers (the public menu read cache) check it on read.
+_menu_listeners: list[Callable[[str], None]] = []
+
+
+class MenuGenerations:
+    """Per-menu change counters shared across processes. The database is created on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS menu_generations (menu_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            self._local.db = db
+        return db
+
+    def get(self, menu_id: str) -> int:
+        # A point read on a WAL database: it never waits on writers, so it is cheap enough for the loop
+        row = self._connect().execute(
+            "SELECT generation FROM menu_generations WHERE menu_id = ?", (menu_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, menu_id: str) -> None:
+        self._connect().execute(
+            "INSERT INTO menu_generations (menu_id, generation) VALUES (?, 1) "
+            "ON CONFLICT(menu_id) DO UPDATE SET generation = generation + 1",
+            (menu_id,),
+        )
+
+
+menu_generations = MenuGenerations(settings.menu_generations_db_path)
+
+
+def on_menu_changed(listener: Callable[[str], None]) -> Callable[[str], None]:
+    _menu_listeners.append(listener)
+    return listener
+
+
+def _bump_generation(menu_id: str) -> None:
+    try:
+        menu_generations.bump(menu_id)
+    except Exception as e:
+        logger.error(f"Menu generation bump failed for menu_id={menu_id}: {str(e)}")
+
+
+def _notify_listeners(menu_id: str) -> None:
+    for listener in _menu_listeners:
+        try:
+            listener(menu_id)
+        except Exception as e:
+            logger.error(f"Menu invalidation listener failed for menu_id={menu_id}: {str(e)}")
+
+
+def menu_changed(menu_id) -> None:
+    """For code running in worker threads and CLIs; async handlers use menu_changed_async."""
+    menu_id = str(menu_id)
+    _bump_generation(menu_id)
+    _notify_listeners(menu_id)
+
+
+async def menu_changed_async(menu_id) -> None:
+    """
+    menu_changed for the event loop: local caches are dropped inline, and the shared bump,
+    a SQLite write that can wait on another worker's lock, runs in a worker thread.
+    """
+    menu_id = str(menu_id)
+    _notify_listeners(menu_id)
+    await run_in_threadpool(_bump_generation, menu_id)
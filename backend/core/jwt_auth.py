@@ -0,0 +1,89 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import jwt
+
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_ASYMMETRIC_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+# Signing keys are fetched once from Supabase Auth and reused until the JWKS cache lifespan passes
+_jwks_client = jwt.PyJWKClient(
+    f"{settings.supabase_url}/auth/v1/.well-known/jwks.json",
+    cache_keys=True,
+    lifespan=settings.auth_jwks_cache_seconds,
+    timeout=5,
+)
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Minimal user resolved from verified JWT claims (mirrors the attributes routers use)."""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    claims: dict = field(default_factory=dict, compare=False, hash=False)
+
+
+class LocalVerificationUnavailable(Exception):
+    """No key is available to verify this token locally; the caller may fall back to Supabase Auth."""
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Reads `exp` without verifying; only use on tokens that were verified another way."""
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return None
+
+
+def uses_jwks(token: str) -> bool:
+    """True when verifying this token may fetch the JWKS (blocking network I/O on a cache miss)."""
+    return jwt.get_unverified_header(token).get("alg") in _ASYMMETRIC_ALGORITHMS
+
+
+def verify_token_locally(token: str) -> tuple[AuthenticatedUser, float]:
+    """
+    Verifies a Supabase access token's signature and claims in-process.
+    HS256 tokens are checked against SUPABASE_JWT_SECRET; asymmetric tokens against the
+    project's cached JWKS. Returns the user and the token's expiry timestamp.
+    Raises jwt.PyJWTError for invalid tokens.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not configured")
+        key = settings.supabase_jwt_secret
+    elif algorithm in _ASYMMETRIC_ALGORITHMS:
+        try:
+            key = _jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientConnectionError as e:
+            raise LocalVerificationUnavailable(f"JWKS fetch failed: {str(e)}")
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported JWT algorithm: {algorithm}")
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=settings.auth_jwt_audience,
+        options={"require": ["exp", "sub"]},
+        leeway=5,
+    )
+    user = AuthenticatedUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        claims=claims,
+    )
+    return user, float(claims["exp"])
+
+
+def seconds_until(expires_at: Optional[float]) -> float:
+    if expires_at is None:
+        return 0.0
+    return expires_at - time.time()
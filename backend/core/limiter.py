@@ -1,5 +1,161 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable
 
-# Limiter instance for use across the app
-limiter = Limiter(key_func=get_remote_address)
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+from backend.db.ownership import get_menu_owner
+from backend.dependencies import get_current_user
+
+logger = get_logger(__name__)
+
+# Cost-weighted token buckets shared by every worker process on the host. Each caller has a
+# bucket of RATE_LIMIT_CAPACITY tokens refilled at RATE_LIMIT_REFILL_PER_MINUTE; a request
+# takes RATE_LIMIT_COSTS[endpoint] tokens, so an expensive vision parse drains far more of
+# the budget than a search and cheap reads are not limited at all. Buckets live in SQLite
+# and every take is one IMMEDIATE transaction, so N uvicorn workers share one budget.
+# Public restaurant-wide buckets sit behind a smaller per-client bucket (RATE_LIMIT_CLIENT_*),
+# so a single client cannot drain the budget every diner of that restaurant shares.
+
+
+class TokenBucketStore:
+    def __init__(self, path: str, capacity: float, refill_per_second: float, table: str = "rate_limit_buckets"):
+        self.path = path
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        # Stores with different capacity/refill keep separate tables, since pruning depends on both
+        self.table = table
+        self._local = threading.local()
+        self._takes = 0
+        with self._connect() as db:
+            db.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def take(self, key: str, cost: float) -> tuple[bool, float, float]:
+        """Tries to take `cost` tokens. Returns (allowed, tokens left, seconds until `cost` is available)."""
+        # A full bucket always admits one request, however expensive
+        cost = min(cost, self.capacity)
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(f"SELECT tokens, updated_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            tokens = self.capacity if row is None else min(
+                self.capacity, row[0] + (now - row[1]) * self.refill_per_second
+            )
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            db.execute(
+                f"INSERT INTO {self.table} (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        if self._takes % 1000 == 0:
+            self._prune(now)
+        retry_after = 0.0 if allowed else (cost - tokens) / self.refill_per_second
+        return allowed, tokens, retry_after
+
+    def _prune(self, now: float) -> None:
+        # A bucket idle long enough to be full again is equivalent to no row at all
+        self._connect().execute(
+            f"DELETE FROM {self.table} WHERE updated_at < ?",
+            (now - self.capacity / self.refill_per_second,),
+        )
+
+
+bucket_store = TokenBucketStore(
+    path=settings.rate_limit_db_path,
+    capacity=settings.rate_limit_capacity,
+    refill_per_second=settings.rate_limit_refill_per_minute / 60.0,
+)
+
+client_bucket_store = TokenBucketStore(
+    path=settings.rate_limit_db_path,
+    capacity=settings.rate_limit_client_capacity,
+    refill_per_second=settings.rate_limit_client_refill_per_minute / 60.0,
+    table="rate_limit_client_buckets",
+)
+
+
+def _consume(key: str, endpoint: str, response: Response, store: TokenBucketStore = bucket_store) -> None:
+    cost = settings.rate_limit_costs.get(endpoint, 1)
+    try:
+        allowed, remaining, retry_after = store.take(key, cost)
+    except sqlite3.Error as e:
+        # Never fail a request because the limiter store is unavailable
+        logger.error(f"Rate limiter store error, allowing request: {str(e)}")
+        return
+    if not allowed:
+        logger.warning(f"Rate limit exceeded for {key} on {endpoint} (cost {cost})")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded for {endpoint}, retry in {math.ceil(retry_after)}s",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    # With stacked buckets the tightest one is reported
+    previous = response.headers.get("X-RateLimit-Remaining")
+    response.headers["X-RateLimit-Remaining"] = str(int(min(remaining, float(previous)) if previous else remaining))
+
+
+def limit_per_user(endpoint: str) -> Callable:
+    """Dependency charging the authenticated user's bucket RATE_LIMIT_COSTS[endpoint] tokens."""
+    def dependency(response: Response, user=Depends(get_current_user)) -> None:
+        if settings.rate_limit_enabled:
+            _consume(f"user:{user.id}", endpoint, response)
+    return dependency
+
+
+def limit_per_restaurant(endpoint: str) -> Callable:
+    """
+    Dependency for public, menu-scoped endpoints: charges the bucket of the restaurant that
+    owns `menu_id`, so one restaurant's diners share a budget regardless of their IPs.
+    Each client IP is first charged its own smaller bucket for that restaurant; a client
+    that runs out gets 429 without touching the shared budget.
+    """
+    async def dependency(request: Request, response: Response, menu_id: str = Query(...)) -> None:
+        if not settings.rate_limit_enabled:
+            return
+        try:
+            owner = await get_menu_owner(menu_id)
+        except Exception:
+            owner = None
+        client = f"ip:{request.client.host if request.client else 'unknown'}"
+        if not owner:
+            # The SQLite transaction can wait on another worker's lock, so it stays off the event loop
+            await run_in_threadpool(_consume, client, endpoint, response)
+            return
+        key = f"restaurant:{owner['restaurant_id']}"
+
+        def consume_both() -> None:
+            _consume(f"{key}:{client}", endpoint, response, client_bucket_store)
+            _consume(key, endpoint, response)
+
+        await run_in_threadpool(consume_both)
+    return dependency
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Optional
+
+import numpy as np
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+from backend.core.invalidation import menu_generations, on_menu_changed
+from backend.core.logging_config import get_logger
+from backend.db.repositories import menu_item_repository
+
+logger = get_logger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _parse_embedding(value) -> Optional[list]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, list) and value else None
+
+
+class MenuIndex:
+    """
+    Search index for one menu: a contiguous, L2-normalised float32 embedding matrix
+    for cosine scoring and a BM25 inverted index over name/description/category.
+    """
+
+    def __init__(self, rows: list[dict], generation: int = 0):
+        # The menu's shared generation (backend.core.invalidation) the rows were loaded at
+        self.generation = generation
+        embeddings = [_parse_embedding(row.pop("embedding", None)) for row in rows]
+        self.rows = rows
+        size = len(rows)
+        dims = max((len(e) for e in embeddings if e), default=0)
+
+        self.matrix = np.zeros((size, dims), dtype=np.float32)
+        self.has_embedding = np.zeros(size, dtype=bool)
+        for i, embedding in enumerate(embeddings):
+            if embedding and len(embedding) == dims:
+                self.matrix[i] = embedding
+                self.has_embedding[i] = True
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        np.divide(self.matrix, norms, out=self.matrix, where=norms > 0)
+
+        self.categories = np.array([(row.get("category") or "").lower() for row in rows], dtype=object)
+        self.is_veg = np.array([row.get("is_veg") for row in rows], dtype=object)
+        self.prices = np.array(
+            [float(row["price"]) if row.get("price") is not None else np.nan for row in rows],
+            dtype=np.float64,
+        )
+
+        # BM25: term -> (document indices, term frequencies)
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(size, dtype=np.float32)
+        for i, row in enumerate(rows):
+            tokens = tokenize(" ".join(str(row.get(f) or "") for f in ("name", "description", "category")))
+            lengths[i] = len(tokens)
+            for term, count in Counter(tokens).items():
+                postings[term][0].append(i)
+                postings[term][1].append(count)
+        self.postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()) if size else 0.0, 1.0))
+
+    def _filter_mask(self, category: Optional[str], is_veg: Optional[bool], price_max: Optional[float]) -> np.ndarray:
+        mask = np.ones(len(self.rows), dtype=bool)
+        if category:
+            mask &= self.categories == category.lower()
+        if is_veg is not None:
+            mask &= self.is_veg == is_veg
+        if price_max is not None:
+            mask &= self.prices <= price_max
+        return mask
+
+    def _bm25(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        size = len(self.rows)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (size - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + self.length_norm[docs])
+        return scores
+
+    def search(
+        self,
+        query_embedding: Optional[list],
+        query: str,
+        category: Optional[str] = None,
+        is_veg: Optional[bool] = None,
+        price_max: Optional[float] = None,
+        limit: int = 10,
+    ) -> list[dict]:
+        mask = self._filter_mask(category, is_veg, price_max)
+        fused = np.zeros(len(self.rows), dtype=np.float64)
+        similarity = np.full(len(self.rows), np.nan, dtype=np.float32)
+
+        if query_embedding is not None and self.matrix.shape[1] == len(query_embedding):
+            q = np.asarray(query_embedding, dtype=np.float32)
+            q /= np.linalg.norm(q) or 1.0
+            similarity = self.matrix @ q
+            candidates = np.flatnonzero(mask & self.has_embedding)
+            ranked = candidates[np.argsort(-similarity[candidates], kind="stable")]
+            fused[ranked] += 1.0 / (RRF_K + np.arange(1, len(ranked) + 1))
+
+        text_scores = self._bm25(query)
+        candidates = np.flatnonzero(mask & (text_scores > 0))
+        ranked = candidates[np.argsort(-text_scores[candidates], kind="stable")]
+        fused[ranked] += 1.0 / (RRF_K + np.arange(1, len(ranked) + 1))
+
+        top = np.flatnonzero(fused > 0)
+        top = top[np.argsort(-fused[top], kind="stable")][:limit]
+        results = []
+        for i in top:
+            row = dict(self.rows[i])
+            row["similarity"] = None if np.isnan(similarity[i]) else float(similarity[i])
+            row["text_score"] = float(text_scores[i])
+            row["score"] = float(fused[i])
+            results.append(row)
+        return results
+
+
+class LocalSearchEngine:
+    """
+    Keeps a MenuIndex per recently searched menu. Indexes are loaded on first use,
+    evicted by LRU/TTL, and reloaded whenever the menu's shared generation moves on, so a
+    write made by any worker or CLI is seen by the next search.
+    """
+
+    def __init__(self, max_menus: int, ttl_seconds: int):
+        self._indexes = TTLCache(max_size=max_menus, ttl_seconds=ttl_seconds)
+        # In-flight (generation, load) per menu, shared by every concurrent caller until the index is stored
+        self._loading: dict[str, tuple[int, asyncio.Future]] = {}
+
+    def invalidate(self, menu_id: str) -> None:
+        # Local fast path; other processes notice the bumped shared generation on their next read
+        self._indexes.pop(str(menu_id))
+        # Callers arriving after the write start a fresh load instead of joining the stale one
+        self._loading.pop(str(menu_id), None)
+
+    def peek(self, menu_id: str) -> Optional[MenuIndex]:
+        """The menu's index if it is in memory and current; never triggers a load."""
+        index = self._indexes.get(str(menu_id))
+        if index is None or index.generation != menu_generations.get(str(menu_id)):
+            return None
+        return index
+
+    async def _load(self, menu_id: str, generation: int) -> MenuIndex:
+        index = MenuIndex(await menu_item_repository.list_for_menu(menu_id, include_embedding=True), generation)
+        # A load that overlaps a write is served but not cached
+        if generation == menu_generations.get(menu_id):
+            self._indexes.set(menu_id, index)
+        logger.info(f"Loaded local search index for menu_id={menu_id} with {len(index.rows)} items")
+        return index
+
+    def _load_finished(self, menu_id: str, load: asyncio.Future) -> None:
+        # By now the index is stored (or the load failed, or was superseded by an invalidation)
+        current = self._loading.get(menu_id)
+        if current is not None and current[1] is load:
+            del self._loading[menu_id]
+
+    async def get_index(self, menu_id: str) -> MenuIndex:
+        generation = menu_generations.get(menu_id)
+        index = self._indexes.get(menu_id)
+        if index is not None and index.generation == generation:
+            return index
+        loading = self._loading.get(menu_id)
+        if loading is not None and loading[0] == generation:
+            load = loading[1]
+        else:
+            load = asyncio.ensure_future(self._load(menu_id, generation))
+            self._loading[menu_id] = (generation, load)
+            load.add_done_callback(lambda done: self._load_finished(menu_id, done))
+        # Shielded so one caller going away does not cancel the load the others are waiting on
+        return await asyncio.shield(load)
+
+    async def search(self, menu_id: str, query_embedding: Optional[list], query: str, **filters) -> list[dict]:
+        index = await self.get_index(menu_id)
+        return index.search(query_embedding, query, **filters)
+
+
+local_search_engine = LocalSearchEngine(
+    max_menus=settings.local_search_max_menus,
+    ttl_seconds=settings.local_search_ttl_seconds,
+)
+on_menu_changed(local_search_engine.invalidate)
@@ -1,33 +1,112 @@
+import atexit
+import contextvars
+import itertools
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import json
 
+from backend.core.config import settings
+
+# Request threads only put records on an in-memory queue; a single listener thread
+# formats them and does the stdout/file I/O. Records are enqueued unformatted, so
+# messages logged with %-style args are only rendered if they are actually emitted.
+
+# Set per HTTP request (and per parse job); copied onto every record logged in that context
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+
+def _truncate(value, limit: int):
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    if isinstance(value, (list, tuple)) and len(value) > 8:
+        return f"[{', '.join(str(v) for v in value[:5])}, ... {len(value)} items]"
+    if isinstance(value, dict):
+        return {k: _truncate(v, limit) for k, v in value.items()}
+    return value
+
+
 class JsonFormatter(logging.Formatter):
     def format(self, record):
+        limit = settings.log_max_field_chars
         log_record = {
             "level": record.levelname,
             "name": record.name,
-            "message": record.getMessage(),
+            "message": _truncate(record.getMessage(), limit),
             "time": self.formatTime(record, self.datefmt),
         }
         if hasattr(record, "request_id"):
             log_record["request_id"] = record.request_id
+        if hasattr(record, "fields"):
+            log_record["fields"] = _truncate(record.fields, limit)
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
-        return json.dumps(log_record)
+        return json.dumps(log_record, default=str)
 
-def get_logger(name: str):
-    logger = logging.getLogger(name)
-    if not logger.handlers:
-        logger.setLevel(logging.INFO)
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes only 1 in LOG_SAMPLE_EVERY records that carry extra={"sample": "<key>"}
+    (counted per key); unmarked records always pass. Runs before enqueueing, so
+    dropped records cost no formatting or I/O.
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counters = defaultdict(itertools.count)
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        return next(self._counters[key]) % self.every == 0
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock prepare() renders the message in the calling thread; the queue is
+    # in-process, so the record can be passed through as-is and formatted by the listener.
+    def prepare(self, record):
+        return record
+
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener = None
+_queue_handler = None
+
+
+def _get_queue_handler() -> QueueHandler:
+    global _listener, _queue_handler
+    if _queue_handler is None:
         # Console handler
         ch = logging.StreamHandler(sys.stdout)
         ch.setFormatter(JsonFormatter())
-        logger.addHandler(ch)
         # Rotating file handler
         fh = RotatingFileHandler("backend.log", maxBytes=2*1024*1024, backupCount=5)
         fh.setFormatter(JsonFormatter())
-        logger.addHandler(fh)
+        _listener = QueueListener(_queue, ch, fh, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _queue_handler = DeferredQueueHandler(_queue)
+        _queue_handler.addFilter(SamplingFilter(settings.log_sample_every))
+        _queue_handler.addFilter(RequestIdFilter())
+    return _queue_handler
+
+
+def get_logger(name: str):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_get_queue_handler())
     logger.propagate = False
     return logger
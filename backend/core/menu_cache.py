@@ -0,0 +1,73 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+from backend.core.invalidation import menu_generations, on_menu_changed
+
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    body: bytes
+    etag: str
+    generation: int = 0
+
+    def not_modified(self, request: Request) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+        return "*" in candidates or self.etag in candidates
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.not_modified(request):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+def build_payload(data: Any, generation: int = 0) -> CachedPayload:
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return CachedPayload(body=body, etag=f'"{generation}-{digest}"', generation=generation)
+
+
+class MenuReadCache:
+    """
+    Read-through cache of fully serialised public menu payloads, keyed by (kind, menu_id).
+    Every write path reports through backend.core.invalidation, which bumps the menu's shared
+    generation and drops all local kinds for that menu. Each read compares the cached payload's
+    generation with the shared one, so a change made by another worker or a CLI is seen on the
+    next request; the generation is part of the ETag. A load that overlaps a write is served
+    but not cached.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self._payloads = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def invalidate(self, menu_id: str) -> None:
+        menu_id = str(menu_id)
+        self._payloads.discard_if(lambda key, _: key[1] == menu_id)
+
+    async def get_or_load(self, kind: str, menu_id, loader: Callable[[], Awaitable[Any]]) -> CachedPayload:
+        key = (kind, str(menu_id))
+        generation = menu_generations.get(key[1])
+        payload = self._payloads.get(key)
+        if payload is None or payload.generation != generation:
+            payload = build_payload(await loader(), generation)
+            if generation == menu_generations.get(key[1]):
+                self._payloads.set(key, payload)
+        return payload
+
+
+menu_read_cache = MenuReadCache(
+    max_size=settings.menu_read_cache_size,
+    ttl_seconds=settings.menu_read_cache_ttl_seconds,
+)
+on_menu_changed(menu_read_cache.invalidate)
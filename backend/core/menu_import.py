@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+from backend.core.config import settings
+from backend.core.invalidation import menu_changed
+from backend.core.logging_config import get_logger
+from backend.core.menu_pipeline import attach_embeddings, dedupe_key
+from backend.db.supabase_client import get_supabase_client
+from backend.models.menu_item import MenuItemBase
+
+logger = get_logger(__name__)
+
+# Bulk import of MenuItemCreate-shaped rows from a CSV, JSON or NDJSON file. Rows are read
+# and validated one at a time and written in IMPORT_CHUNK_SIZE chunks: each chunk is embedded
+# in batched requests, then new rows are inserted and rows matching an existing item (same
+# normalized name/category/price) update that item with only the columns the file provides,
+# batched per chunk by the set of columns they set.
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/vnd.ms-excel"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "json"
+
+
+def iter_import_rows(stream: BinaryIO, file_format: str) -> Iterator[dict]:
+    """Yields raw row dicts from the upload. CSV and NDJSON are read incrementally."""
+    if file_format == "csv":
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+        for row in reader:
+            # Empty cells mean "not set" (the stored value is kept on update), not an empty string
+            yield {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+    elif file_format == "ndjson":
+        for line in io.TextIOWrapper(stream, encoding="utf-8-sig"):
+            if line.strip():
+                yield json.loads(line)
+    else:
+        data = json.load(io.TextIOWrapper(stream, encoding="utf-8-sig"))
+        # Also accepts the {"menu_items": [...]} shape the parse endpoint produces
+        rows = data.get("menu_items", []) if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of menu items")
+        yield from rows
+
+
+class MenuImport:
+    def __init__(self, menu_id: str):
+        self.menu_id = menu_id
+        self.supabase = get_supabase_client()
+        self.report: list[dict] = []
+        self.seen: set = set()
+        # Normalized key -> id of the items already on the menu (light projection, no embeddings)
+        existing = (
+            self.supabase.table("menu_items").select("id, name, category, price").eq("menu_id", menu_id).execute()
+        )
+        self.existing_ids = {dedupe_key(item): item["id"] for item in existing.data or []}
+
+    def run(self, rows: Iterator[dict]) -> dict:
+        chunk: list[tuple[int, dict, set]] = []
+        row_number = 0
+        try:
+            for raw in rows:
+                row_number += 1
+                if row_number > settings.import_max_rows:
+                    self.report.append({"row": row_number, "status": "invalid", "errors": [
+                        f"Import is limited to {settings.import_max_rows} rows; remaining rows were not read"
+                    ]})
+                    break
+                validated = self._validate(row_number, raw)
+                if validated is not None:
+                    chunk.append((row_number, *validated))
+                if len(chunk) >= settings.import_chunk_size:
+                    self._write(chunk)
+                    chunk = []
+        except (ValueError, csv.Error) as e:
+            # Unreadable file or line: keep what was read before it, report the rest as not imported
+            row_number += 1
+            self.report.append({"row": row_number, "status": "invalid", "errors": [f"Could not read the file from here on: {str(e)}"]})
+        if chunk:
+            self._write(chunk)
+
+        counts = {status: 0 for status in ("created", "updated", "duplicate", "invalid", "failed")}
+        for entry in self.report:
+            counts[entry["status"]] += 1
+        if counts["created"] or counts["updated"]:
+            menu_changed(self.menu_id)
+        logger.info(f"Imported menu items for menu_id={self.menu_id}: {counts}")
+        self.report.sort(key=lambda entry: entry["row"])
+        return {"menu_id": self.menu_id, "rows_read": row_number, **counts, "rows": self.report}
+
+    def _validate(self, row_number: int, raw) -> Optional[tuple[dict, set]]:
+        """Returns the full item (for inserts) and the columns the row actually set (for updates)."""
+        if not isinstance(raw, dict):
+            self.report.append({"row": row_number, "status": "invalid", "errors": ["Row is not an object"]})
+            return None
+        row_menu_id = raw.pop("menu_id", None)
+        if row_menu_id and str(row_menu_id) != self.menu_id:
+            self.report.append({"row": row_number, "status": "invalid", "errors": ["menu_id does not match the import target"]})
+            return None
+        try:
+            model = MenuItemBase(**raw)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+            self.report.append({"row": row_number, "status": "invalid", "errors": errors})
+            return None
+        item = jsonable_encoder(model.dict())
+        provided = set(model.dict(exclude_unset=True))
+        key = dedupe_key(item)
+        if key in self.seen:
+            self.report.append({"row": row_number, "status": "duplicate", "name": item["name"]})
+            return None
+        self.seen.add(key)
+        item["price"] = float(item["price"])
+        item["menu_id"] = self.menu_id
+        return item, provided
+
+    def _write(self, chunk: list[tuple[int, dict, set]]) -> None:
+        attach_embeddings([item for _, item, _ in chunk])
+        inserts, updates = [], []
+        for row_number, item, provided in chunk:
+            existing_id = self.existing_ids.get(dedupe_key(item))
+            if existing_id:
+                # Columns the file left out keep their stored values. The fresh embedding is only written
+                # when the row sets the description it was built from and the embedding call succeeded.
+                keys = (*provided, "embedding", "embedding_version") if "description" in provided else provided
+                # id and menu_id make the upsert hit this row (and satisfy NOT NULL on its insert half)
+                fields = {key: item[key] for key in keys if key in item}
+                fields.update(id=existing_id, menu_id=self.menu_id)
+                updates.append((row_number, existing_id, fields))
+            else:
+                inserts.append((row_number, item))
+        self._insert(inserts)
+        self._update(updates)
+
+    def _insert(self, rows: list[tuple[int, dict]]) -> None:
+        if not rows:
+            return
+        try:
+            written = (
+                self.supabase.table("menu_items").insert([item for _, item in rows])
+                .select("id, name, category, price").execute().data or []
+            )
+        except Exception as e:
+            logger.error(f"Menu import chunk failed for menu_id={self.menu_id}: {str(e)}")
+            for row_number, item in rows:
+                self.report.append({"row": row_number, "status": "failed", "name": item["name"], "errors": [str(e)]})
+            return
+        ids = {dedupe_key(item): item["id"] for item in written}
+        for row_number, item in rows:
+            item_id = ids.get(dedupe_key(item))
+            self.existing_ids[dedupe_key(item)] = item_id
+            self.report.append({"row": row_number, "status": "created", "id": item_id, "name": item["name"]})
+
+    def _update(self, rows: list[tuple[int, str, dict]]) -> None:
+        # Rows setting the same columns go out as one upsert on id. PostgREST only overwrites the
+        # columns in the payload, and the keys are the same within a group, so each row keeps
+        # the stored values of the columns it left out.
+        groups: dict[frozenset, list[tuple[int, str, dict]]] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row[2]), []).append(row)
+        for group in groups.values():
+            try:
+                self.supabase.table("menu_items").upsert(
+                    [fields for _, _, fields in group], on_conflict="id"
+                ).execute()
+            except Exception as e:
+                logger.error(f"Menu import update chunk failed for menu_id={self.menu_id}: {str(e)}")
+                for row_number, _, fields in group:
+                    self.report.append({"row": row_number, "status": "failed", "name": fields["name"], "errors": [str(e)]})
+                continue
+            for row_number, item_id, fields in group:
+                self.report.append({"row": row_number, "status": "updated", "id": item_id, "name": fields["name"]})
+
+
+def import_menu_items(menu_id: str, stream: BinaryIO, file_format: str) -> dict:
+    """Imports every row of the upload into the menu and returns the per-row report."""
+    return MenuImport(str(menu_id)).run(iter_import_rows(stream, file_format))
@@ -0,0 +1,439 @@
+import base64
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Optional
+
+import httpx
+import numpy as np
+from postgrest.types import ReturnMethod
+
+from backend.core.config import settings
+from backend.core.embeddings import embed_texts, embedding_version
+from backend.core.http_clients import get_http_client
+from backend.core.image_prep import prepare_uploads
+from backend.core.invalidation import menu_changed
+from backend.core.local_search import local_search_engine
+from backend.core.logging_config import get_logger
+from backend.core.metrics import bind_context, timed
+from backend.core.parse_cache import parse_result_cache
+from backend.db.projections import MENU_ITEM_COLUMNS
+from backend.db.supabase_client import get_supabase_client
+
+logger = get_logger(__name__)
+
+# The prompt extracted from ScanUploadScreen.tsx
+PROMPT = """
+### ROLE AND GOAL ###
+You are an AI-powered Intelligent Menu Analyst. Your purpose is twofold:
+1.  **Extract:** Meticulously analyze the provided menu image and extract all explicit information (item names, descriptions, prices, categories).
+2.  **Enrich:** Where information is missing, you must use your extensive culinary knowledge to infer and add valuable attributes like vegetarian status, spice level, and a generated description.
+
+Your output is critical for a customer-facing AI. Accuracy is paramount. You must clearly distinguish between information you have extracted and information you have inferred.
+
+### CONTEXT ###
+The image is a restaurant menu. It may be incomplete, have handwritten specials, or lack detailed descriptions. Your job is to create a complete, structured, and intelligent dataset from this image.
+
+### DETAILED INSTRUCTIONS ###
+1.  **Identify Sections:** Scan the menu to identify distinct sections (e.g., "Appetizers," "Main Courses," "Pasta"). This will be the `category`.
+
+2.  **Extract and Enrich Item Attributes:** For each item, you will generate a JSON object with the following attributes:
+
+    *   **'name' (string):** Extract the exact item name. Capitalize it as a proper title.
+
+    *   **'description' (string):**
+        *   **If a description exists on the menu,** extract it precisely as written.
+        *   **If a description is ABSENT,** you MUST generate a brief, accurate, and appealing one-sentence description based on the item's name and your culinary knowledge.
+
+    *   **'description_source' (string):** This is a mandatory field for tracking your work.
+        *   Set this to '"extracted"' if you took the description directly from the menu.
+        *   Set this to '"inferred"' if you generated the description yourself.
+
+    *   **'price' (string):** Extract and sanitize the price, removing currency symbols. If multiple prices/sizes exist, create a separate JSON object for each variant (e.g., "Soup (Cup)" and "Soup (Bowl)").
+
+    *   **'category' (string):** Assign the section heading (e.g., "Appetizers").
+
+    *   **'is_veg' (boolean):** This MUST be inferred. Analyze the item's name and description.
+        *   Return 'true' if the dish is vegetarian (contains no meat, poultry, or fish). Look for keywords like "vegetable," "paneer," "tofu," or plant-based names.
+        *   Return 'false' if it contains meat, poultry, or fish. Be conservative: if a dish is traditionally non-vegetarian (e.g., "Caesar Salad" with anchovies, "Spaghetti Carbonara" with guanciale) and not explicitly marked as vegetarian, you should default to 'false'.
+
+    *   **'spice_level' (string):** This MUST be inferred. Estimate the spice level based on the item's name, ingredients, and origin. You MUST use one of the following exact string values:
+        *   "none" (Default for most dishes)
+        *   "mild"
+        *   "medium"
+        *   "hot"
+        *   Look for keywords: "Spicy," "Chili," "Diabla," "Arrabbiata," "Jalapeño," "Habanero," "Vindaloo," "Sichuan."
+
+3.  **Exclusion Criteria:** Ignore all non-menu text like addresses, phone numbers, logos, and general restaurant slogans.
+
+### OUTPUT FORMAT ###
+Your entire response MUST be a single, valid JSON object with no introductory text or markdown formatting. The root key must be 'menu_items', an array of objects structured exactly as defined below.
+
+### EXAMPLE ###
+Here is a perfect example of the required output format, demonstrating both extracted and inferred data.
+
+{
+  "menu_items": [
+    {
+      "name": "Classic Caesar Salad",
+      "description": "Crisp romaine lettuce, house-made croutons, parmesan cheese, and creamy Caesar dressing.",
+      "description_source": "extracted",
+      "price": "12.00",
+      "category": "Salads",
+      "is_veg": false,
+      "spice_level": "none"
+    },
+    {
+      "name": "Penne Arrabbiata",
+      "description": "Pasta in a spicy tomato sauce made with garlic and red chili peppers.",
+      "description_source": "inferred",
+      "price": "18.00",
+      "category": "Pasta",
+      "is_veg": true,
+      "spice_level": "hot"
+    },
+    {
+      "name": "Pollo al Mattone",
+      "description": "Chicken under a brick, crispy skin, lemon-herb sauce.",
+      "description_source": "extracted",
+      "price": "26.50",
+      "category": "Main Courses",
+      "is_veg": false,
+      "spice_level": "none"
+    },
+    {
+      "name": "Lamb Vindaloo",
+      "description": "A classic Goan curry with tender lamb marinated in vinegar and hot spices.",
+      "description_source": "inferred",
+      "price": "24.00",
+      "category": "Main Courses",
+      "is_veg": false,
+      "spice_level": "hot"
+    }
+  ]
+}
+"""
+
+AZURE_ENDPOINT = settings.azure_openai_vision_url
+
+# Cached parse results are only reused for the same prompt and deployment
+VISION_CACHE_VERSION = hashlib.sha256(f"{AZURE_ENDPOINT}\n{PROMPT}".encode("utf-8")).hexdigest()[:16]
+
+
+class MenuParsingError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# progress(stage, **info) is called as the pipeline moves between stages
+ProgressCallback = Callable[..., None]
+
+
+def _no_progress(stage: str, **info) -> None:
+    pass
+
+
+def vision_request(image_bytes: bytes, content_type: str) -> tuple[dict, dict]:
+    """Headers and body of the vision chat-completions request for one image."""
+    base64_str = base64.b64encode(image_bytes).decode("utf-8")
+    data_url = f"data:{content_type};base64,{base64_str}"
+
+    headers = {
+        "Content-Type": "application/json",
+        "api-key": settings.azure_openai_api_key,
+    }
+    body = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": data_url,
+                        },
+                    },
+                    {
+                        "type": "text",
+                        "text": PROMPT,
+                    },
+                ],
+            }
+        ],
+        "max_tokens": 8192,
+    }
+    return headers, body
+
+
+def raise_for_vision_error(response: httpx.Response) -> None:
+    logger.info(f"Azure API response status: {response.status_code}")
+    if not response.is_success:
+        # Streamed responses have not read their body yet
+        response.read()
+        try:
+            error_msg = response.json().get("error", {}).get("message", "")
+        except Exception:
+            error_msg = response.text
+        logger.error(f"Azure API error: {response.status_code} - {error_msg}")
+        raise MenuParsingError(502, f"Azure API error: {response.status_code} - {error_msg}")
+
+
+def call_vision(image_bytes: bytes, content_type: str) -> str:
+    """Sends one image with PROMPT to the vision deployment and returns the raw model output."""
+    headers, body = vision_request(image_bytes, content_type)
+    logger.info("Calling Azure OpenAI API for menu parsing")
+    with timed("azure_vision"):
+        response = get_http_client().post(AZURE_ENDPOINT, headers=headers, json=body, timeout=60)
+    raise_for_vision_error(response)
+
+    data = response.json()
+    ocr_text = (
+        data.get("choices", [{}])[0].get("message", {}).get("content")
+        or data.get("choices", [{}])[0].get("content")
+    )
+    if not ocr_text:
+        logger.error("No OCR result found in Azure response.")
+        raise MenuParsingError(500, "No OCR result found in Azure response.")
+    return ocr_text
+
+
+def try_parse_json(text):
+    # Remove code block markers if present
+    text = text.strip()
+    # Remove triple backticks and optional 'json'
+    codeblock_pattern = r"^```(?:json)?\s*([\s\S]*?)\s*```$"
+    match = re.match(codeblock_pattern, text, re.IGNORECASE)
+    if match:
+        text = match.group(1).strip()
+    # Try parsing as JSON
+    try:
+        return json.loads(text)
+    except Exception:
+        # If text looks like a stringified JSON (starts and ends with quotes, lots of \n or \")
+        if (
+            text.startswith('"') and text.endswith('"')
+            and ('\\n' in text or '\\"' in text)
+        ):
+            try:
+                unescaped = json.loads(text)
+                return json.loads(unescaped)
+            except Exception:
+                pass
+    return None
+
+
+def _normalize_text(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def _normalize_price(value) -> str:
+    text = re.sub(r"[^\d.]", "", str(value or ""))
+    try:
+        return str(Decimal(text).quantize(Decimal("0.01")))
+    except (InvalidOperation, ValueError):
+        return text
+
+
+def item_identity(item: dict) -> tuple:
+    """(name, price) key that survives casing, whitespace and "12" vs "12.00" differences."""
+    return (_normalize_text(item.get("name")), _normalize_price(item.get("price")))
+
+
+def merge_items(item_lists: list[list]) -> list:
+    """
+    Merges items extracted from overlapping tiles/pages in reading order. An item seen twice
+    (e.g. straddling a tile boundary) is kept once, preferring the copy with more fields filled.
+    """
+    merged: dict = {}
+    for items in item_lists:
+        for item in items:
+            if not isinstance(item, dict) or not item.get("name"):
+                continue
+            key = item_identity(item)
+            current = merged.get(key)
+            if current is None or sum(1 for v in item.values() if v not in (None, "")) > sum(
+                1 for v in current.values() if v not in (None, "")
+            ):
+                merged[key] = item
+    return list(merged.values())
+
+
+def _extract_image(image: tuple[bytes, str], menu_id: Optional[str] = None) -> tuple[Optional[list], Optional[str]]:
+    """Items for one vision input, from the parse cache when possible. Returns (items, raw text if unparsable)."""
+    image_bytes, content_type = image
+    cached = parse_result_cache.get(image_bytes, VISION_CACHE_VERSION, scope=menu_id)
+    if cached is not None:
+        logger.info(f"Parse cache hit, skipping vision call ({len(cached)} items)")
+        return cached, None
+    ocr_text = call_vision(image_bytes, content_type)
+    menu_json = try_parse_json(ocr_text)
+    if menu_json and isinstance(menu_json, dict) and "menu_items" in menu_json:
+        items = menu_json.get("menu_items", [])
+        parse_result_cache.put(image_bytes, VISION_CACHE_VERSION, items, scope=menu_id)
+        return items, None
+    return None, ocr_text
+
+
+def extract_menu_items(images: list[tuple[bytes, str]], menu_id: Optional[str] = None) -> tuple[Optional[list], list[str]]:
+    """
+    Runs the vision extraction over every image/tile concurrently (up to
+    VISION_MAX_CONCURRENCY) and merges the results. Returns (items or None if no
+    tile produced valid JSON, raw outputs of tiles that could not be parsed).
+    """
+    workers = max(1, min(settings.vision_max_concurrency, len(images)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outputs = list(pool.map(bind_context(_extract_image), images, [menu_id] * len(images)))
+
+    item_lists, unparsed = [], []
+    for items, ocr_text in outputs:
+        if items is not None:
+            item_lists.append(items)
+        else:
+            unparsed.append(ocr_text)
+    if not item_lists:
+        return None, unparsed
+    if unparsed:
+        logger.warning(f"{len(unparsed)} of {len(images)} vision outputs were not valid JSON")
+    return merge_items(item_lists), unparsed
+
+
+def dedupe_key(item: dict) -> tuple:
+    """Normalized (name, category, price), so "Paneer Tikka " / "paneer tikka" and "12" / "12.00" match."""
+    return (_normalize_text(item.get("name")), _normalize_text(item.get("category")), _normalize_price(item.get("price")))
+
+
+def existing_item_keys(menu_id: str) -> set:
+    """Dedupe keys of the items already on the menu, from a name/category/price projection (never embeddings)."""
+    existing_resp = (
+        get_supabase_client().table("menu_items").select("name, category, price").eq("menu_id", menu_id).execute()
+    )
+    return set(dedupe_key(item) for item in existing_resp.data or [])
+
+
+def attach_embeddings(items: list) -> None:
+    """
+    Embeds "name + description" for each item in batched requests, setting item["embedding"]
+    and, with EMBEDDING_VERSION_TAGGING on, its version tag.
+    """
+    embedding_inputs = [
+        f"{item.get('name') or ''} {item.get('description') or ''}".strip()
+        for item in items
+    ]
+    embeddings = embed_texts(embedding_inputs) if items else []
+    for item, embedding_input, embedding in zip(items, embedding_inputs, embeddings):
+        # Per-item lines are sampled (LOG_SAMPLE_EVERY); failures below are always logged
+        logger.info("Menu item embedding input: %s", embedding_input, extra={"sample": "item_embedding_input"})
+        if embedding is not None:
+            logger.debug("Menu item embedding (first 5): %s", embedding[:5], extra={"sample": "item_embedding_preview"})
+            item["embedding"] = embedding
+            if settings.embedding_version_tagging:
+                item["embedding_version"] = embedding_version()
+        else:
+            logger.warning(f"Embedding not generated for item: {item.get('name', '')}")
+
+
+def drop_near_duplicates(menu_id: str, items: list) -> list:
+    """
+    Optional semantic pass over freshly embedded items (DEDUPE_SEMANTIC_ENABLED): an item whose
+    embedding has cosine similarity >= DEDUPE_SIMILARITY_THRESHOLD with an earlier new item, or
+    with an existing item of the menu, at the same price is dropped. Existing items are only
+    compared when the menu's local search index is already in memory, so no embeddings are fetched.
+    """
+    if not settings.dedupe_semantic_enabled:
+        return items
+    positions = [i for i, item in enumerate(items) if item.get("embedding")]
+    if not positions:
+        return items
+    matrix = np.asarray([items[i]["embedding"] for i in positions], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    prices = [_normalize_price(items[i].get("price")) for i in positions]
+    threshold = settings.dedupe_similarity_threshold
+    dropped = set()
+
+    index = local_search_engine.peek(menu_id)
+    if index is not None and index.matrix.shape[1] == matrix.shape[1]:
+        existing_prices = [_normalize_price(row.get("price")) for row in index.rows]
+        for new, existing in zip(*np.nonzero(matrix @ index.matrix.T >= threshold)):
+            if prices[new] == existing_prices[existing]:
+                dropped.add(new)
+
+    # Among the new items the first of each near-duplicate group is kept
+    for first, later in zip(*np.nonzero(np.triu(matrix @ matrix.T >= threshold, k=1))):
+        if prices[first] == prices[later]:
+            dropped.add(later)
+
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} near-duplicate menu items for menu_id={menu_id}")
+    dropped_items = {positions[i] for i in dropped}
+    return [item for i, item in enumerate(items) if i not in dropped_items]
+
+
+def persist_menu_items(menu_id: str, parsed_items: list, progress: ProgressCallback = _no_progress) -> list:
+    """Dedupes parsed items against the menu, embeds and inserts the new ones, and returns all items."""
+    supabase = get_supabase_client()
+
+    # --- Persist parsed items to DB, concatenating with existing ---
+    progress("dedupe", parsed=len(parsed_items))
+    existing_keys = existing_item_keys(menu_id)
+
+    # Filter out duplicates, both against the menu and within this upload
+    new_items = []
+    for item in parsed_items:
+        key = dedupe_key(item)
+        if item.get("name") and key not in existing_keys:
+            existing_keys.add(key)
+            item["menu_id"] = menu_id
+            new_items.append(item)
+
+    # Generate embeddings for "name + description" in batched requests
+    progress("embedding", new_items=len(new_items))
+    attach_embeddings(new_items)
+    new_items = drop_near_duplicates(menu_id, new_items)
+
+    logger.info(f"{len(new_items)} new menu items to insert for menu_id={menu_id}")
+
+    # Insert new items if any
+    # (returning=minimal: the rows are re-read below without their embeddings)
+    progress("inserting", new_items=len(new_items))
+    if new_items:
+        supabase.table("menu_items").insert(new_items, returning=ReturnMethod.minimal).execute()
+        menu_changed(menu_id)
+
+    # Return all menu items for this menu
+    all_resp = supabase.table("menu_items").select(MENU_ITEM_COLUMNS).eq("menu_id", menu_id).execute()
+    all_items = all_resp.data or []
+    logger.info(f"Returning {len(all_items)} total menu items for menu_id={menu_id}")
+    return all_items
+
+
+def run_parse_pipeline(
+    files: list[tuple[bytes, Optional[str]]],
+    menu_id: str,
+    progress: ProgressCallback = _no_progress,
+) -> dict:
+    """
+    Full menu-parsing pipeline over one or more uploads (images and/or multi-page PDFs):
+    page rasterization, concurrent vision extraction, JSON parsing, one merged dedupe,
+    embeddings and a single insert.
+    Returns {"menu_items": [...]} or, if the model output is not valid JSON, {"raw_ocr_result": ...}.
+    """
+    progress("preprocessing", files=len(files), bytes=sum(len(data) for data, _ in files))
+    with timed("image_prep"):
+        tiles = prepare_uploads(files)
+    if not tiles:
+        raise MenuParsingError(status_code=422, detail="No readable pages in the uploaded file(s)")
+
+    progress("vision", tiles=len(tiles))
+    parsed_items, unparsed = extract_menu_items(tiles, menu_id)
+    if parsed_items is not None:
+        logger.info(f"Parsing result: {len(parsed_items)} items extracted")
+        return {"menu_items": persist_menu_items(menu_id, parsed_items, progress)}
+    # Try to parse JSON, or return as string if not valid JSON
+    logger.warning("Failed to parse JSON from OCR result (after code block and stringified JSON handling).")
+    return {"raw_ocr_result": "\n\n".join(unparsed)}
@@ -0,0 +1,236 @@
+import json
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from backend.core.config import settings
+from backend.core.http_clients import get_http_client
+from backend.core.image_prep import prepare_uploads
+from backend.core.invalidation import menu_changed
+from backend.core.logging_config import get_logger
+from backend.core.metrics import bind_context, timed
+from backend.core.menu_pipeline import (
+    AZURE_ENDPOINT,
+    VISION_CACHE_VERSION,
+    MenuParsingError,
+    attach_embeddings,
+    dedupe_key,
+    drop_near_duplicates,
+    existing_item_keys,
+    item_identity,
+    raise_for_vision_error,
+    try_parse_json,
+    vision_request,
+)
+from backend.core.parse_cache import parse_result_cache
+from backend.db.projections import MENU_ITEM_COLUMNS
+from backend.db.supabase_client import get_supabase_client
+
+logger = get_logger(__name__)
+
+# Streaming variant of the parse pipeline: the vision output is consumed token by token,
+# each object of the "menu_items" array is picked out as soon as its closing brace arrives,
+# and items are embedded and inserted in small batches while the model is still writing.
+
+_MENU_ITEMS_START = re.compile(r'"menu_items"\s*:\s*\[')
+
+
+class MenuItemStreamParser:
+    """Incremental parser for the `{"menu_items": [{...}, ...]}` shape of the vision output."""
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start: Optional[int] = None
+        self.items_found = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Appends a chunk of model output and returns the items completed by it."""
+        self.text += chunk
+        if self._finished:
+            return []
+        if not self._in_array:
+            match = _MENU_ITEMS_START.search(self.text)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the menu_items array itself
+                    self._finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    try:
+                        item = json.loads(text[self._start:i + 1])
+                    except ValueError:
+                        logger.warning("Skipping malformed item in streamed vision output")
+                    else:
+                        if isinstance(item, dict):
+                            items.append(item)
+                    self._start = None
+        self._pos = len(text)
+        self.items_found += len(items)
+        return items
+
+
+def stream_vision(image_bytes: bytes, content_type: str) -> Iterator[str]:
+    """Calls the vision deployment with stream=true and yields the content deltas."""
+    headers, body = vision_request(image_bytes, content_type)
+    body["stream"] = True
+    logger.info("Calling Azure OpenAI API for menu parsing (streaming)")
+    with timed("azure_vision"), get_http_client().stream("POST", AZURE_ENDPOINT, headers=headers, json=body, timeout=60) as response:
+        raise_for_vision_error(response)
+        for line in response.iter_lines():
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+
+def _stream_image_items(image: tuple[bytes, str], menu_id: str, out: queue.Queue) -> None:
+    """Producer for one vision input: puts ("item", item) messages, then one ("done", raw text or None)."""
+    image_bytes, content_type = image
+    cached = parse_result_cache.get(image_bytes, VISION_CACHE_VERSION, scope=menu_id)
+    if cached is not None:
+        logger.info(f"Parse cache hit, skipping vision call ({len(cached)} items)")
+        for item in cached:
+            out.put(("item", item))
+        out.put(("done", None))
+        return
+
+    parser = MenuItemStreamParser()
+    for delta in stream_vision(image_bytes, content_type):
+        for item in parser.feed(delta):
+            out.put(("item", item))
+
+    menu_json = try_parse_json(parser.text)
+    if menu_json and isinstance(menu_json, dict) and "menu_items" in menu_json:
+        items = menu_json.get("menu_items", [])
+        parse_result_cache.put(image_bytes, VISION_CACHE_VERSION, items, scope=menu_id)
+        if not parser.items_found:
+            # e.g. the model returned the JSON as an escaped string; nothing was streamed yet
+            for item in items:
+                out.put(("item", item))
+        out.put(("done", None))
+    else:
+        out.put(("done", parser.text if not parser.items_found else None))
+
+
+def _run_producer(image: tuple[bytes, str], menu_id: str, out: queue.Queue) -> None:
+    try:
+        _stream_image_items(image, menu_id, out)
+    except Exception as e:
+        logger.error(f"Streaming vision extraction failed: {str(e)}", exc_info=True)
+        out.put(("error", e))
+
+
+def stream_parse_pipeline(files: list[tuple[bytes, Optional[str]]], menu_id: str) -> Iterator[dict]:
+    """
+    Prepares the uploads (raising MenuParsingError before anything is streamed) and returns
+    an iterator of events: "started", one "item" per inserted row, "raw_ocr_result" for
+    pages whose output was not JSON, "error" for failed pages, and a final "done".
+    """
+    with timed("image_prep"):
+        tiles = prepare_uploads(files)
+    if not tiles:
+        raise MenuParsingError(status_code=422, detail="No readable pages in the uploaded file(s)")
+    return _stream_events(tiles, menu_id)
+
+
+def _stream_events(tiles: list[tuple[bytes, str]], menu_id: str) -> Iterator[dict]:
+    yield {"event": "started", "tiles": len(tiles)}
+    # Loaded before any producer starts, so a failure here leaves no pool behind
+    supabase = get_supabase_client()
+    existing_keys = existing_item_keys(menu_id)
+    # The same (name, price) merge as merge_items across overlapping tiles; items are inserted as
+    # they arrive, so the first copy wins rather than the most complete one
+    streamed_identities: set = set()
+    messages: queue.Queue = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(settings.vision_max_concurrency, len(tiles))))
+    for tile in tiles:
+        pool.submit(bind_context(_run_producer), tile, menu_id, messages)
+
+    remaining = len(tiles)
+    inserted = duplicates = failed = 0
+    try:
+        while remaining:
+            # Block for the next message, then take whatever else is already waiting
+            pending = [messages.get()]
+            while len(pending) < settings.embedding_batch_size:
+                try:
+                    pending.append(messages.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = []
+            for kind, value in pending:
+                if kind == "item":
+                    if not isinstance(value, dict) or not value.get("name"):
+                        continue
+                    key, identity = dedupe_key(value), item_identity(value)
+                    if key in existing_keys or identity in streamed_identities:
+                        duplicates += 1
+                        continue
+                    existing_keys.add(key)
+                    streamed_identities.add(identity)
+                    value["menu_id"] = menu_id
+                    batch.append(value)
+                else:
+                    remaining -= 1
+                    if kind == "error":
+                        failed += 1
+                        yield {"event": "error", "detail": str(getattr(value, "detail", value))}
+                    elif value is not None:
+                        yield {"event": "raw_ocr_result", "raw_ocr_result": value}
+
+            if batch:
+                attach_embeddings(batch)
+                kept = drop_near_duplicates(menu_id, batch)
+                duplicates += len(batch) - len(kept)
+                batch = kept
+            if batch:
+                rows = supabase.table("menu_items").insert(batch).select(MENU_ITEM_COLUMNS).execute().data or []
+                menu_changed(menu_id)
+                inserted += len(rows)
+                for row in rows:
+                    yield {"event": "item", "item": row}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Streamed parse inserted {inserted} menu items for menu_id={menu_id}")
+    yield {"event": "done", "inserted": inserted, "duplicates": duplicates, "failed_tiles": failed}
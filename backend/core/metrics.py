@@ -0,0 +1,173 @@
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Optional, Union
+
+import httpx
+
+from backend.core.logging_config import request_id_var
+
+# Per-stage latency for outbound calls (Azure chat/embeddings/vision, Supabase table/RPC/auth).
+# Every timed stage is observed into a per-process histogram labelled by stage and endpoint,
+# and appended to the current request's timing list, which the HTTP middleware turns into a
+# Server-Timing header. Worker threads see the request's list through bind_context().
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_timings_var: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("stage_timings", default=None)
+# A fixed label ("parse_job") or the ASGI scope of the current request, resolved lazily because
+# the route is only known once the router has matched it
+_endpoint_var: contextvars.ContextVar[Union[str, dict]] = contextvars.ContextVar("endpoint", default="background")
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets: tuple = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_latency = Histogram(
+    "menumind_stage_duration_seconds", "Latency of outbound calls by stage and endpoint.", ("stage", "endpoint")
+)
+request_latency = Histogram(
+    "menumind_request_duration_seconds", "HTTP request latency by endpoint.", ("method", "endpoint", "status")
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    stage_latency.observe((stage, current_endpoint()), seconds)
+    timings = _timings_var.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Wraps fn for a thread pool so each call runs with the submitting request's context."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def _supabase_stage(path: str) -> Optional[str]:
+    if "/rest/v1/rpc/" in path:
+        return "supabase_rpc"
+    if "/rest/v1/" in path:
+        return "supabase_table"
+    if "/auth/v1/" in path:
+        return "supabase_auth"
+    if "/storage/v1/" in path or "/functions/v1/" in path:
+        return "supabase"
+    # Azure calls share the pooled clients but are timed by their callers, which know the stage
+    return None
+
+
+class TimedTransport(httpx.HTTPTransport):
+    """httpx transport for the shared clients that times every Supabase request (until response headers)."""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        stage = _supabase_stage(request.url.path)
+        if stage is None:
+            return super().handle_request(request)
+        with timed(stage):
+            return super().handle_request(request)
+
+
+class AsyncTimedTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stage = _supabase_stage(request.url.path)
+        if stage is None:
+            return await super().handle_async_request(request)
+        with timed(stage):
+            return await super().handle_async_request(request)
+
+
+def endpoint_label(scope: dict) -> str:
+    """Route template ("/menu-items/{item_id}") so labels do not explode with ids."""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def current_endpoint() -> str:
+    endpoint = _endpoint_var.get()
+    return endpoint if isinstance(endpoint, str) else endpoint_label(endpoint)
+
+
+def start_request(request_id: str, endpoint: Union[str, dict]) -> tuple[list, list]:
+    """Sets the request context; returns (timings list, tokens for end_request)."""
+    timings: list = []
+    tokens = [
+        (request_id_var, request_id_var.set(request_id)),
+        (_timings_var, _timings_var.set(timings)),
+        (_endpoint_var, _endpoint_var.set(endpoint)),
+    ]
+    return timings, tokens
+
+
+def end_request(tokens: list) -> None:
+    for var, token in reversed(tokens):
+        var.reset(token)
+
+
+def server_timing(timings: list, total_seconds: float) -> str:
+    """Server-Timing header value; repeated stages are summed, with the call count in desc."""
+    totals: dict[str, list] = {}
+    for stage, seconds in list(timings):
+        entry = totals.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [
+        f'{stage};dur={seconds * 1000:.1f}' + (f';desc="{count} calls"' if count > 1 else "")
+        for stage, (seconds, count) in totals.items()
+    ]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics() -> str:
+    return "\n".join([*stage_latency.render(), *request_latency.render()]) + "\n"
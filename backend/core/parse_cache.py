@@ -0,0 +1,190 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from backend.core.config import settings
+from backend.core.image_prep import perceptual_hash
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class ParseResultCache:
+    """
+    Caches the `menu_items` extracted from a vision input, keyed by the exact SHA-256 of the
+    (preprocessed) image. With `perceptual` on, a 256-bit perceptual dHash within
+    `max_distance` bits is accepted as a fallback so a recompressed or resized copy also hits,
+    but only for an entry stored for the same menu. A page-level hash cannot see an edited
+    price or line of text, so near matches never cross menus and the fallback is opt-in.
+    Entries are scoped to a `version` (prompt + deployment) and stored in SQLite, shared by
+    every worker on the host; the table is kept under `max_bytes` by evicting the least
+    recently used entries.
+    """
+
+    def __init__(self, path: Optional[str], max_bytes: int, max_distance: int, perceptual: bool = False):
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self.perceptual = perceptual
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # Counters are bumped from the parse worker threads
+        self._stats_lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parse_results (
+                    sha256 TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    phash TEXT,
+                    aspect REAL,
+                    items TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    scope TEXT,
+                    PRIMARY KEY (sha256, version)
+                )
+                """
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(parse_results)")}
+            if "scope" not in columns:
+                # Older entries have no menu scope, so they only serve exact matches
+                self._db.execute("ALTER TABLE parse_results ADD COLUMN scope TEXT")
+            self._db.execute("CREATE INDEX IF NOT EXISTS parse_results_aspect ON parse_results (version, aspect)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS parse_results_lru ON parse_results (last_used_at)")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, image_bytes: bytes, version: str, scope: Optional[str] = None) -> Optional[list]:
+        """`scope` (the menu id) limits perceptual matches to entries stored for the same menu."""
+        if self._db is None:
+            return None
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT sha256, items FROM parse_results WHERE sha256 = ? AND version = ?", (digest, version)
+            ).fetchone()
+        if row is not None:
+            self._count("exact_hits")
+        else:
+            row = self._find_similar(image_bytes, version, scope) if self.perceptual and scope else None
+            if row is None:
+                self._count("misses")
+                return None
+            self._count("perceptual_hits")
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE parse_results SET hits = hits + 1, last_used_at = ? WHERE sha256 = ? AND version = ?",
+                (time.time(), row[0], version),
+            )
+            self._db.commit()
+        return json.loads(row[1])
+
+    def _find_similar(self, image_bytes: bytes, version: str, scope: str) -> Optional[tuple]:
+        fingerprint = perceptual_hash(image_bytes)
+        if fingerprint is None:
+            return None
+        phash, aspect = fingerprint
+        with self._db_lock:
+            candidates = self._db.execute(
+                "SELECT sha256, items, phash FROM parse_results "
+                "WHERE version = ? AND scope = ? AND aspect BETWEEN ? AND ? AND phash IS NOT NULL",
+                (version, scope, aspect - 0.02, aspect + 0.02),
+            ).fetchall()
+        best, best_distance = None, self.max_distance + 1
+        for sha256, items, candidate in candidates:
+            distance = (phash ^ int(candidate, 16)).bit_count()
+            if distance < best_distance:
+                best, best_distance = (sha256, items), distance
+        return best
+
+    def put(self, image_bytes: bytes, version: str, items: list, scope: Optional[str] = None) -> None:
+        if self._db is None:
+            return
+        fingerprint = perceptual_hash(image_bytes) if self.perceptual and scope else None
+        phash, aspect = (f"{fingerprint[0]:064x}", fingerprint[1]) if fingerprint else (None, None)
+        payload = json.dumps(items, separators=(",", ":"))
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                """
+                INSERT INTO parse_results (sha256, version, phash, aspect, items, size, created_at, last_used_at, scope)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(sha256, version) DO UPDATE SET
+                    items = excluded.items,
+                    size = excluded.size,
+                    last_used_at = excluded.last_used_at,
+                    phash = excluded.phash,
+                    aspect = excluded.aspect,
+                    scope = excluded.scope
+                """,
+                (hashlib.sha256(image_bytes).hexdigest(), version, phash, aspect, payload, len(payload), now, now, scope),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM parse_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT sha256, version, size FROM parse_results ORDER BY last_used_at").fetchall()
+        for sha256, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM parse_results WHERE sha256 = ? AND version = ?", (sha256, version))
+            total -= size
+            self._count("evictions")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            exact_hits, perceptual_hits, misses, evictions = (
+                self.exact_hits, self.perceptual_hits, self.misses, self.evictions
+            )
+        lookups = exact_hits + perceptual_hits + misses
+        hits = exact_hits + perceptual_hits
+        entries, size = 0, 0
+        if self._db is not None:
+            with self._db_lock:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parse_results"
+                ).fetchone()
+        return {
+            "enabled": self._db is not None,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "perceptual_enabled": self.perceptual,
+            "lookups": lookups,
+            "exact_hits": exact_hits,
+            "perceptual_hits": perceptual_hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "vision_calls_saved": hits,
+        }
+
+
+parse_result_cache = ParseResultCache(
+    path=settings.parse_cache_path,
+    max_bytes=settings.parse_cache_max_bytes,
+    max_distance=settings.parse_cache_max_distance,
+    perceptual=settings.parse_cache_perceptual_enabled,
+)
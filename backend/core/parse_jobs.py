@@ -0,0 +1,260 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from backend.core.config import settings
+from backend.core.logging_config import get_logger
+from backend.core.metrics import end_request, start_request
+
+logger = get_logger(__name__)
+
+# Jobs live in a local SQLite database and uploads on disk, so a queue survives restarts and
+# is shared by every uvicorn worker on the host without an external broker. Claiming a job is
+# a single UPDATE ... RETURNING inside an IMMEDIATE transaction that records the claiming
+# process as its owner. Each process heartbeats the jobs it owns and periodically requeues
+# running jobs whose owner stopped heartbeating (PARSE_JOB_STALE_SECONDS), i.e. died mid-run.
+# A job whose run has killed its worker PARSE_JOB_MAX_ATTEMPTS times (say a decompression
+# bomb or a PDF that crashes the renderer) is failed instead of being handed to the next one.
+
+JobHandler = Callable[[dict, Callable[..., None]], dict]
+
+
+class ParseJobQueue:
+    def __init__(self, db_path: str, upload_dir: str):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._workers: list[threading.Thread] = []
+        self._local = threading.local()
+
+    def _init_storage(self) -> None:
+        # Done in start() (the app lifespan), so importing the module touches nothing on disk
+        os.makedirs(self.upload_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parse_jobs (
+                    id TEXT PRIMARY KEY,
+                    menu_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    payload TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row[1] for row in db.execute("PRAGMA table_info(parse_jobs)")}
+            if "owner" not in columns:
+                db.execute("ALTER TABLE parse_jobs ADD COLUMN owner TEXT")
+            if "heartbeat_at" not in columns:
+                db.execute("ALTER TABLE parse_jobs ADD COLUMN heartbeat_at REAL")
+            if "attempts" not in columns:
+                db.execute("ALTER TABLE parse_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS parse_jobs_status ON parse_jobs (status, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def submit(self, menu_id: str, user_id: str, files: list[tuple[str, str, bytes]], options: Optional[dict] = None) -> str:
+        """Stores the uploads (filename, content_type, bytes) and enqueues a job. Returns the job id."""
+        job_id = str(uuid.uuid4())
+        stored = []
+        for index, (filename, content_type, data) in enumerate(files):
+            path = os.path.join(self.upload_dir, f"{job_id}-{index}")
+            with open(path, "wb") as f:
+                f.write(data)
+            stored.append({"path": path, "filename": filename, "content_type": content_type})
+        payload = {"files": stored, "options": options or {}}
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO parse_jobs (id, menu_id, user_id, status, stage, payload, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+            (job_id, menu_id, str(user_id), json.dumps(payload), now, now),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        logger.info(f"Queued parse job {job_id} for menu_id={menu_id} with {len(files)} file(s)")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT * FROM parse_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        for internal in ("payload", "owner", "heartbeat_at"):
+            job.pop(internal)
+        return job
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        # Only while this process still owns the job: once requeued, the new owner's writes win
+        self._connect().execute(
+            f"UPDATE parse_jobs SET {assignments} WHERE id = ? AND owner = ?", (*fields.values(), job_id, self.owner)
+        )
+
+    def _claim(self) -> Optional[dict]:
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = db.execute(
+                """
+                UPDATE parse_jobs SET status = 'running', stage = 'starting', owner = ?, heartbeat_at = ?, updated_at = ?,
+                    attempts = attempts + 1
+                WHERE id = (SELECT id FROM parse_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)
+                RETURNING *
+                """,
+                (self.owner, now, now),
+            ).fetchone()
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def heartbeat(self) -> None:
+        self._connect().execute(
+            "UPDATE parse_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (time.time(), self.owner)
+        )
+
+    def requeue_stale(self) -> int:
+        """
+        Puts back running jobs whose owner has not heartbeaten for PARSE_JOB_STALE_SECONDS,
+        and fails those that have already been claimed PARSE_JOB_MAX_ATTEMPTS times.
+        """
+        db = self._connect()
+        now = time.time()
+        stale = "status = 'running' AND COALESCE(heartbeat_at, updated_at) < ?"
+        cutoff = now - settings.parse_job_stale_seconds
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            abandoned = db.execute(
+                f"UPDATE parse_jobs SET status = 'failed', stage = 'failed', owner = NULL, error = ?, updated_at = ? "
+                f"WHERE {stale} AND attempts >= ? RETURNING id, attempts, payload",
+                (
+                    "Parsing stopped responding on every attempt; the file may be corrupt or too large to process",
+                    now,
+                    cutoff,
+                    settings.parse_job_max_attempts,
+                ),
+            ).fetchall()
+            requeued = db.execute(
+                f"UPDATE parse_jobs SET status = 'queued', stage = 'queued', owner = NULL WHERE {stale}", (cutoff,)
+            ).rowcount
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        for row in abandoned:
+            logger.error(f"Parse job {row['id']} failed after {row['attempts']} attempt(s) that never finished")
+            for stored in json.loads(row["payload"]).get("files", []):
+                try:
+                    os.remove(stored["path"])
+                except OSError:
+                    pass
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale parse job(s)")
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return requeued
+
+    def _run(self, job: dict, handler: JobHandler) -> None:
+        job_id = job["id"]
+        progress_state: dict = {}
+        # Logs and stage metrics from the job are tagged with the job id / "parse_job"
+        _, context_tokens = start_request(job_id, "parse_job")
+
+        def progress(stage: str, **info) -> None:
+            progress_state.update(info)
+            self._update(job_id, stage=stage, progress=json.dumps(progress_state))
+
+        try:
+            result = handler(job, progress)
+            self._update(job_id, status="succeeded", stage="done", result=json.dumps(result, default=str))
+            logger.info(f"Parse job {job_id} succeeded")
+        except Exception as e:
+            logger.error(f"Parse job {job_id} failed: {str(e)}", exc_info=True)
+            self._update(job_id, status="failed", stage="failed", error=str(getattr(e, "detail", e)))
+        finally:
+            end_request(context_tokens)
+            for stored in job["payload"].get("files", []):
+                try:
+                    os.remove(stored["path"])
+                except OSError:
+                    pass
+
+    def _worker_loop(self, handler: JobHandler) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim parse job: {str(e)}")
+                job = None
+            if job is None:
+                # Poll as well as wait, so jobs submitted by other processes are picked up
+                with self._wakeup:
+                    self._wakeup.wait(timeout=settings.parse_job_poll_seconds)
+                continue
+            self._run(job, handler)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopping.wait(settings.parse_job_heartbeat_seconds):
+            try:
+                self.heartbeat()
+                self.requeue_stale()
+            except Exception as e:
+                logger.error(f"Parse job heartbeat failed: {str(e)}")
+
+    def start(self, handler: JobHandler, workers: int) -> None:
+        self._init_storage()
+        self.requeue_stale()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="parse-heartbeat", daemon=True)
+        heartbeat.start()
+        self._workers.append(heartbeat)
+        for index in range(workers):
+            thread = threading.Thread(
+                target=self._worker_loop, args=(handler,), name=f"parse-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._workers.append(thread)
+        logger.info(f"Started {workers} parse worker(s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._workers:
+            thread.join(timeout=timeout)
+        self._workers.clear()
+
+
+parse_job_queue = ParseJobQueue(
+    db_path=settings.parse_jobs_db_path,
+    upload_dir=settings.parse_jobs_upload_dir,
+)
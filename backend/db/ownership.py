@@ -0,0 +1,105 @@
+from typing import Optional
+
+from fastapi import HTTPException
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+from backend.db.supabase_client import get_async_supabase_client
+
+# Short-lived cache of "who owns this restaurant/menu/item", shared by all routers.
+# Each lookup is a single PostgREST query that embeds the parent rows.
+_ownership_cache = TTLCache(
+    max_size=settings.ownership_cache_size,
+    ttl_seconds=settings.ownership_cache_ttl_seconds,
+)
+
+
+async def get_restaurant_owner(restaurant_id) -> Optional[dict]:
+    key = ("restaurant", str(restaurant_id))
+    owner = _ownership_cache.get(key)
+    if owner is None:
+        supabase = await get_async_supabase_client()
+        result = await supabase.table("restaurants").select("id, owner_id").eq("id", str(restaurant_id)).limit(1).execute()
+        if not result.data:
+            return None
+        owner = {"restaurant_id": result.data[0]["id"], "owner_id": result.data[0]["owner_id"]}
+        _ownership_cache.set(key, owner)
+    return owner
+
+
+async def get_menu_owner(menu_id) -> Optional[dict]:
+    key = ("menu", str(menu_id))
+    owner = _ownership_cache.get(key)
+    if owner is None:
+        supabase = await get_async_supabase_client()
+        result = await supabase.table("menus").select(
+            "id, restaurant_id, restaurants(owner_id)"
+        ).eq("id", str(menu_id)).limit(1).execute()
+        if not result.data:
+            return None
+        row = result.data[0]
+        owner = {
+            "menu_id": row["id"],
+            "restaurant_id": row["restaurant_id"],
+            "owner_id": (row.get("restaurants") or {}).get("owner_id"),
+        }
+        _ownership_cache.set(key, owner)
+    return owner
+
+
+async def get_item_owner(item_id) -> Optional[dict]:
+    key = ("item", str(item_id))
+    owner = _ownership_cache.get(key)
+    if owner is None:
+        supabase = await get_async_supabase_client()
+        result = await supabase.table("menu_items").select(
+            "id, menu_id, menus(restaurant_id, restaurants(owner_id))"
+        ).eq("id", str(item_id)).limit(1).execute()
+        if not result.data:
+            return None
+        row = result.data[0]
+        menu = row.get("menus") or {}
+        owner = {
+            "item_id": row["id"],
+            "menu_id": row["menu_id"],
+            "restaurant_id": menu.get("restaurant_id"),
+            "owner_id": (menu.get("restaurants") or {}).get("owner_id"),
+        }
+        _ownership_cache.set(key, owner)
+    return owner
+
+
+async def require_restaurant_owner(restaurant_id, user, detail: str) -> dict:
+    owner = await get_restaurant_owner(restaurant_id)
+    if not owner or owner["owner_id"] != user.id:
+        raise HTTPException(status_code=403, detail=detail)
+    return owner
+
+
+async def require_menu_owner(menu_id, user, detail: str) -> dict:
+    owner = await get_menu_owner(menu_id)
+    if not owner:
+        raise HTTPException(status_code=404, detail="Menu not found")
+    if owner["owner_id"] != user.id:
+        raise HTTPException(status_code=403, detail=detail)
+    return owner
+
+
+async def require_item_owner(item_id, user, detail: str) -> dict:
+    owner = await get_item_owner(item_id)
+    if not owner:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    if owner["owner_id"] != user.id:
+        raise HTTPException(status_code=403, detail=detail)
+    return owner
+
+
+def forget_item(item_id) -> None:
+    _ownership_cache.pop(("item", str(item_id)))
+
+
+def forget_menu(menu_id) -> None:
+    menu_id = str(menu_id)
+    _ownership_cache.pop(("menu", menu_id))
+    # Items go with their menu
+    _ownership_cache.discard_if(lambda key, owner: key[0] == "item" and owner["menu_id"] == menu_id)
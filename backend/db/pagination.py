@@ -0,0 +1,62 @@
+import json
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from backend.core.config import settings
+
+# Keyset pagination over PostgREST: rows are ordered by `id` and each page starts
+# strictly after the last id of the previous one, so cost is flat at any depth.
+# The routers page with the *_async variants (async Supabase client); fetch_page serves the CLIs.
+
+
+def fetch_page(build_query: Callable[[], Any], limit: int, after: Optional[str] = None) -> tuple[list, Optional[str]]:
+    """Returns one page of rows and the cursor for the next page (None on the last page)."""
+    query = build_query().order("id")
+    if after:
+        query = query.gt("id", str(after))
+    result = query.limit(limit + 1).execute()
+    rows = result.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+
+async def fetch_page_async(build_query: Callable[[], Any], limit: int, after: Optional[str] = None) -> tuple[list, Optional[str]]:
+    query = build_query().order("id")
+    if after:
+        query = query.gt("id", str(after))
+    result = await query.limit(limit + 1).execute()
+    rows = result.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+
+async def iter_rows_async(build_query: Callable[[], Any], page_size: Optional[int] = None, after: Optional[str] = None) -> AsyncIterator[dict]:
+    """Yields every row (after the cursor) page by page; only one page is held in memory at a time."""
+    page_size = page_size or settings.list_page_size_max
+    while True:
+        rows, after = await fetch_page_async(build_query, page_size, after)
+        for row in rows:
+            yield row
+        if after is None:
+            return
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str], limit: int) -> None:
+    if next_cursor is None:
+        return
+    next_url = request.url.include_query_params(after=next_cursor, limit=limit)
+    response.headers["X-Next-Cursor"] = str(next_cursor)
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+def ndjson_response(rows: AsyncIterator[dict], serialize: Callable[[dict], Any]) -> StreamingResponse:
+    async def lines():
+        async for row in rows:
+            yield json.dumps(serialize(row), separators=(",", ":")) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
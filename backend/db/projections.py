@@ -0,0 +1,13 @@
+# Explicit column lists for PostgREST selects. The 1536-dimension `embedding` vector is
+# by far the largest column on menu_items, so reads leave it out unless asked for.
+
+MENU_ITEM_COLUMNS = (
+    "id, menu_id, name, description, description_source, price, category, "
+    "is_veg, spice_level, image_url, created_at"
+)
+
+MENU_COLUMNS = "id, restaurant_id, title, created_at"
+
+
+def menu_item_columns(include_embedding: bool = False) -> str:
+    return f"{MENU_ITEM_COLUMNS}, embedding" if include_embedding else MENU_ITEM_COLUMNS
@@ -0,0 +1,119 @@
+from typing import AsyncIterator, Optional
+
+from backend.db.pagination import fetch_page_async, iter_rows_async
+from backend.db.projections import MENU_COLUMNS, menu_item_columns
+from backend.db.supabase_client import get_async_supabase_client
+
+# Async data access for restaurants, menus and menu items. Every query goes through the
+# worker's async Supabase client (one pooled HTTP client underneath), so a request waiting
+# on PostgREST holds no thread. Reads return plain row dicts, or None when the row does not
+# exist; writes return the written row, or None when PostgREST returned nothing.
+# Ownership checks live in backend.db.ownership; cache invalidation stays with the callers.
+
+
+async def _table(name: str):
+    supabase = await get_async_supabase_client()
+    return supabase.table(name)
+
+
+async def _first(query) -> Optional[dict]:
+    result = await query.limit(1).execute()
+    return result.data[0] if result.data else None
+
+
+async def _written(query) -> Optional[dict]:
+    result = await query.execute()
+    return result.data[0] if result.data else None
+
+
+class RestaurantRepository:
+    async def get_by_owner(self, owner_id: str) -> Optional[dict]:
+        table = await _table("restaurants")
+        return await _first(table.select("*").eq("owner_id", owner_id))
+
+    async def create(self, owner_id: str, name: str) -> Optional[dict]:
+        table = await _table("restaurants")
+        return await _written(table.insert({"owner_id": owner_id, "name": name}))
+
+    async def update(self, restaurant_id, fields: dict) -> Optional[dict]:
+        table = await _table("restaurants")
+        return await _written(table.update(fields).eq("id", str(restaurant_id)))
+
+
+class MenuRepository:
+    async def get(self, menu_id) -> Optional[dict]:
+        table = await _table("menus")
+        return await _first(table.select(MENU_COLUMNS).eq("id", str(menu_id)))
+
+    async def list_page(self, limit: int, after=None) -> tuple[list, Optional[str]]:
+        supabase = await get_async_supabase_client()
+        return await fetch_page_async(lambda: supabase.table("menus").select(MENU_COLUMNS), limit, after)
+
+    async def iter_all(self, after=None) -> AsyncIterator[dict]:
+        supabase = await get_async_supabase_client()
+        async for row in iter_rows_async(lambda: supabase.table("menus").select(MENU_COLUMNS), after=after):
+            yield row
+
+    async def list_for_restaurant(self, restaurant_id) -> list:
+        table = await _table("menus")
+        result = await table.select(MENU_COLUMNS).eq("restaurant_id", str(restaurant_id)).execute()
+        return result.data or []
+
+    async def create(self, restaurant_id, title: str) -> Optional[dict]:
+        table = await _table("menus")
+        return await _written(table.insert({"restaurant_id": str(restaurant_id), "title": title}))
+
+    async def update(self, menu_id, fields: dict) -> Optional[dict]:
+        table = await _table("menus")
+        return await _written(table.update(fields).eq("id", str(menu_id)))
+
+    async def delete(self, menu_id) -> None:
+        table = await _table("menus")
+        await table.delete().eq("id", str(menu_id)).execute()
+
+
+class MenuItemRepository:
+    async def get(self, item_id, include_embedding: bool = False) -> Optional[dict]:
+        table = await _table("menu_items")
+        return await _first(table.select(menu_item_columns(include_embedding)).eq("id", str(item_id)))
+
+    async def list_for_menu(self, menu_id, include_embedding: bool = False) -> list:
+        table = await _table("menu_items")
+        result = await table.select(menu_item_columns(include_embedding)).eq("menu_id", str(menu_id)).execute()
+        return result.data or []
+
+    async def list_page(self, menu_id, limit: int, after=None, include_embedding: bool = False) -> tuple[list, Optional[str]]:
+        supabase = await get_async_supabase_client()
+        columns = menu_item_columns(include_embedding)
+        build_query = lambda: supabase.table("menu_items").select(columns).eq("menu_id", str(menu_id))
+        return await fetch_page_async(build_query, limit, after)
+
+    async def iter_for_menu(self, menu_id, after=None, include_embedding: bool = False) -> AsyncIterator[dict]:
+        supabase = await get_async_supabase_client()
+        columns = menu_item_columns(include_embedding)
+        build_query = lambda: supabase.table("menu_items").select(columns).eq("menu_id", str(menu_id))
+        async for row in iter_rows_async(build_query, after=after):
+            yield row
+
+    async def categories(self, menu_id) -> list[str]:
+        """Distinct non-empty categories of the menu's items, sorted."""
+        table = await _table("menu_items")
+        result = await table.select("category").eq("menu_id", str(menu_id)).execute()
+        return sorted({row["category"] for row in (result.data or []) if row.get("category")})
+
+    async def create(self, fields: dict) -> Optional[dict]:
+        table = await _table("menu_items")
+        return await _written(table.insert(fields))
+
+    async def update(self, item_id, fields: dict) -> Optional[dict]:
+        table = await _table("menu_items")
+        return await _written(table.update(fields).eq("id", str(item_id)))
+
+    async def delete(self, item_id) -> None:
+        table = await _table("menu_items")
+        await table.delete().eq("id", str(item_id)).execute()
+
+
+restaurant_repository = RestaurantRepository()
+menu_repository = MenuRepository()
+menu_item_repository = MenuItemRepository()
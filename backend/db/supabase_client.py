@@ -1,13 +1,29 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, acreate_client, AsyncClient, ClientOptions, AClientOptions
 from backend.core.config import settings
+from backend.core.http_clients import get_async_http_client, get_http_client
 
 _supabase_client: Client = None
+_async_supabase_client: AsyncClient = None
 
 def get_supabase_client() -> Client:
+    """Sync client for code running in worker threads (parse jobs, bulk import, CLIs)."""
     global _supabase_client
     if _supabase_client is None:
+        # Requests go through the shared pooled client (keep-alive, per-stage timing)
         _supabase_client = create_client(
             settings.supabase_url,
-            settings.supabase_service_role_key
+            settings.supabase_service_role_key,
+            options=ClientOptions(httpx_client=get_http_client()),
         )
     return _supabase_client
+
+async def get_async_supabase_client() -> AsyncClient:
+    """Async client for request paths that must not block the event loop."""
+    global _async_supabase_client
+    if _async_supabase_client is None:
+        _async_supabase_client = await acreate_client(
+            settings.supabase_url,
+            settings.supabase_service_role_key,
+            options=AClientOptions(httpx_client=get_async_http_client()),
+        )
+    return _async_supabase_client
@@ -1,26 +1,78 @@
+import hashlib
+import jwt
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from backend.db.supabase_client import get_supabase_client
+from starlette.concurrency import run_in_threadpool
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+from backend.core.jwt_auth import (
+    LocalVerificationUnavailable,
+    seconds_until,
+    token_expiry,
+    uses_jwks,
+    verify_token_locally,
+)
+from backend.core.logging_config import get_logger
+from backend.db.supabase_client import get_async_supabase_client
+
+logger = get_logger(__name__)
 
 security = HTTPBearer()
 
-def get_current_user(
+# Resolved users keyed by token hash; each entry lives until its token expires
+_user_cache = TTLCache(
+    max_size=settings.auth_user_cache_size,
+    ttl_seconds=settings.auth_user_cache_max_ttl_seconds,
+)
+
+def _invalid_credentials() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials",
+    )
+
+async def _get_user_remote(token: str):
+    supabase = await get_async_supabase_client()
+    # Validate JWT with Supabase Auth API
+    user_response = await supabase.auth.get_user(token)
+    return user_response.user
+
+async def _verify_locally(token: str):
+    # HS256 checks are pure CPU; a JWKS refresh is blocking I/O and must stay off the event loop
+    if uses_jwks(token):
+        return await run_in_threadpool(verify_token_locally, token)
+    return verify_token_locally(token)
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     token = credentials.credentials
-    supabase = get_supabase_client()
-    try:
-        # Validate JWT with Supabase Auth API
-        user_response = supabase.auth.get_user(token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-            )
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    user = _user_cache.get(cache_key)
+    if user is not None:
         return user
+
+    expires_at = None
+    try:
+        if settings.auth_verification_mode == "local":
+            try:
+                user, expires_at = await _verify_locally(token)
+            except LocalVerificationUnavailable as e:
+                logger.warning(f"Local JWT verification unavailable, using Supabase Auth: {str(e)}")
+                user = await _get_user_remote(token)
+        else:
+            user = await _get_user_remote(token)
+    except jwt.PyJWTError as e:
+        logger.info(f"Rejected JWT: {str(e)}")
+        raise _invalid_credentials()
     except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-        )
+        raise _invalid_credentials()
+    if not user:
+        raise _invalid_credentials()
+
+    if expires_at is None:
+        expires_at = token_expiry(token)
+    ttl = min(seconds_until(expires_at), settings.auth_user_cache_max_ttl_seconds)
+    if ttl > 0:
+        _user_cache.set(cache_key, user, ttl_seconds=ttl)
+    return user
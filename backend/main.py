@@ -1,12 +1,9 @@
+import time
+import uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from backend.core.limiter import limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
 from backend.api.restaurants import router as restaurants_router
 from backend.api.menus import router as menus_router
 from backend.api.menu_items import router as menu_items_router
@@ -14,20 +11,59 @@ from backend.api.menu_parsing import router as menu_parsing_router
 from backend.api.auth import router as auth_router
 from backend.api.search import router as search_router
 from backend.core.logging_config import get_logger
+from backend.core.config import settings
+from backend.core.metrics import end_request, endpoint_label, render_metrics, request_latency, server_timing, start_request
+from backend.core.embedding_cache import query_embedding_cache
+from backend.core.ai_clients import init_ai_clients, close_ai_clients
+from backend.core.http_clients import close_http_clients
+from backend.db.supabase_client import get_async_supabase_client
+from backend.core.parse_jobs import parse_job_queue
+from backend.api.menu_parsing import run_parse_job
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the pooled clients once per worker instead of per request
+    init_ai_clients()
+    await get_async_supabase_client()
+    # Preload the most frequent past search queries so they skip the embedding call
+    query_embedding_cache.warm_start(settings.query_embedding_cache_warm_start)
+    query_embedding_cache.start()
+    # Background pool for queued menu-parsing jobs
+    parse_job_queue.start(run_parse_job, settings.parse_workers)
+    yield
+    parse_job_queue.stop()
+    query_embedding_cache.stop()
+    close_ai_clients()
+    await close_http_clients()
 
 app = FastAPI(
     title="MenuMind API",
     description="The backend for the MenuMind application.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-# Initialize slowapi Limiter (imported from backend.core.limiter)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
 logger = get_logger("MenuMind")
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    # request_id for log records, per-stage timings for Server-Timing and /metrics
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    timings, tokens = start_request(request_id, request.scope)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        response.headers["Server-Timing"] = server_timing(timings, time.perf_counter() - start)
+        return response
+    finally:
+        request_latency.observe(
+            (request.method, endpoint_label(request.scope), str(status_code)), time.perf_counter() - start
+        )
+        end_request(tokens)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
@@ -43,6 +79,11 @@ app.include_router(menu_parsing_router)
 app.include_router(auth_router)
 app.include_router(search_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of per-stage and per-endpoint latency histograms (this worker)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the MenuMind API!"}
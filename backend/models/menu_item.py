@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional, Union
 from datetime import datetime
 from uuid import UUID
 
@@ -23,11 +23,12 @@ class MenuItemUpdate(MenuItemBase):
 class MenuItemInDB(MenuItemBase):
     id: UUID
     menu_id: UUID
-    embedding: Optional[list[float]] = None
+    # A float list, or a base64 string when a compact embedding_format was requested
+    embedding: Optional[Union[List[float], str]] = None
     created_at: datetime
 
     class Config:
         orm_mode = True
 
 class MenuItemResponse(MenuItemInDB):
-    pass
+    embedding_format: Optional[str] = None